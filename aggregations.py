@@ -0,0 +1,231 @@
+"""
+Time period aggregation shared by the Avalanche dashboard apps.
+Everything here is vectorized: periods are integer offsets computed on the underlying
+datetime64 arrays, products are categorical codes, and labels are formatted once per
+distinct period and broadcast back through categorical codes instead of per row.
+"""
+
+import altair as alt
+import numpy as np
+import pandas as pd
+
+TIME_PERIODS = ["Daily", "Weekly", "Monthly"]
+
+# Label column shown on the x axis for the grouped time periods
+LABEL_COLUMNS = {
+    "Weekly": "WEEK_LABEL",
+    "Monthly": "MONTH_LABEL",
+}
+
+
+def type_reviews(df, score_dtype='float64'):
+    """
+    Type the review columns present in `df`, in place: numeric SENTIMENT_SCORE, datetime64
+    DATE and categorical PRODUCT. Columns that already have their type are left as they are.
+    """
+    if 'SENTIMENT_SCORE' in df:
+        df['SENTIMENT_SCORE'] = pd.to_numeric(df['SENTIMENT_SCORE']).astype(score_dtype, copy=False)
+    if 'DATE' in df:
+        dates = df['DATE']
+        if dates.dtype == object:
+            # Parse each distinct date string once; reviews share a few thousand dates at most
+            codes, uniques = pd.factorize(dates)
+            parsed = pd.to_datetime(uniques).to_numpy(dtype='datetime64[ns]')
+            df['DATE'] = np.where(codes >= 0, parsed[codes], np.datetime64('NaT'))
+        else:
+            df['DATE'] = pd.to_datetime(dates)
+    if 'PRODUCT' in df and not isinstance(df['PRODUCT'].dtype, pd.CategoricalDtype):
+        df['PRODUCT'] = df['PRODUCT'].astype('category')
+    return df
+
+
+def date_parts(dates):
+    """
+    Return the DAY, ISO WEEK, MONTH and YEAR of datetime64 values with integer arithmetic
+    on the day numbers, instead of the much slower `.dt` / `isocalendar()` accessors.
+    Missing dates give missing parts.
+    """
+    values = np.asarray(dates, dtype='datetime64[D]')
+    missing = np.isnat(values)
+    if missing.all():
+        return {name: pd.array([None] * len(values), dtype='Int32') for name in ['DAY', 'WEEK', 'MONTH', 'YEAR']}
+
+    # Compute the parts once per day in range and gather them, rather than per row
+    all_days = values.astype(np.int64)
+    first_day = all_days[~missing].min()
+    offsets = np.where(missing, 0, all_days - first_day)
+    days = np.arange(first_day, all_days[~missing].max() + 1)
+
+    months = days.astype('datetime64[D]').astype('datetime64[M]')
+    years = months.astype('datetime64[Y]')
+    day = (days - months.astype('datetime64[D]').astype(np.int64) + 1)
+    month = months.astype(np.int64) - years.astype(np.int64) * 12 + 1
+    year = years.astype(np.int64) + 1970
+
+    # The ISO week belongs to the year of its Thursday; 1970-01-01 was a Thursday
+    thursday = days - (days + 3) % 7 + 3
+    iso_year = thursday.astype('datetime64[D]').astype('datetime64[Y]')
+    week = (thursday - iso_year.astype('datetime64[D]').astype(np.int64)) // 7 + 1
+
+    parts = {}
+    for name, per_day in [('DAY', day), ('WEEK', week), ('MONTH', month), ('YEAR', year)]:
+        values = per_day.astype(np.int32)[offsets]
+        parts[name] = pd.arrays.IntegerArray(values, missing) if missing.any() else values
+    return parts
+
+
+def prepare_reviews(df):
+    """
+    Type the review columns and add the DAY, WEEK (ISO), MONTH and YEAR date parts.
+    PRODUCT becomes categorical so grouping works on integer codes instead of strings.
+    """
+    type_reviews(df)
+
+    # Add date components
+    for name, values in date_parts(df['DATE']).items():
+        df[name] = values
+    return df
+
+
+def period_index(days, time_period):
+    """
+    Return the number of days, ISO weeks or months between the epoch and the period of
+    each date, given as integer days since the epoch.
+    """
+    if time_period == "Weekly":
+        # 1970-01-01 was a Thursday, so ISO weeks start 3 days before every multiple of 7
+        return (days + 3) // 7
+    if time_period == "Monthly":
+        # Resolve the month once per distinct day in range and gather, rather than per row
+        first_day = days.min()
+        months = np.arange(first_day, days.max() + 1).astype('datetime64[D]').astype('datetime64[M]')
+        return months.astype(np.int64)[days - first_day]
+    return days
+
+
+def period_start(index, time_period):
+    """Return the first day of each period from its `period_index`."""
+    index = np.asarray(index, dtype=np.int64)
+    if time_period == "Monthly":
+        days = index.astype('datetime64[M]').astype('datetime64[D]')
+    elif time_period == "Weekly":
+        days = (index * 7 - 3).astype('datetime64[D]')
+    else:
+        days = index.astype('datetime64[D]')
+    return days.astype('datetime64[ns]')
+
+
+def product_codes(products):
+    """Return integer codes and sorted names for PRODUCT, reusing categorical codes when present."""
+    if isinstance(products.dtype, pd.CategoricalDtype):
+        categories = products.cat.categories
+        order = np.argsort(categories.to_numpy(dtype=str))
+        rank = np.empty_like(order)
+        rank[order] = np.arange(len(order))
+        codes = products.cat.codes.to_numpy()
+        return np.where(codes >= 0, rank[codes], -1), categories[order]
+    return pd.factorize(products, sort=True)
+
+
+def period_labels(periods, time_period):
+    """Format WEEK_LABEL ("2023-W42") or MONTH_LABEL ("2023-10") values for period starts."""
+    codes, uniques = pd.factorize(periods, sort=True)
+    uniques = pd.DatetimeIndex(uniques)
+    if time_period == "Weekly":
+        iso = uniques.isocalendar()
+        categories = [f"{year}-W{week:02d}" for year, week in zip(iso['year'], iso['week'])]
+    else:
+        categories = uniques.strftime('%Y-%m')
+    return pd.Categorical.from_codes(codes, categories=categories, ordered=True)
+
+
+def aggregate_time_period(df, time_period):
+    """
+    Aggregate the mean SENTIMENT_SCORE per product for the selected time period.
+
+    Periods and products are packed into one integer key so the count and sum of every
+    period/product pair come out of a single `np.bincount` pass over the rows.
+
+    Returns one row per period and product with DATE (start of the period), PRODUCT,
+    SENTIMENT_SCORE and REVIEW_COUNT, plus WEEK_LABEL or MONTH_LABEL.
+    """
+    dates = pd.to_datetime(df['DATE']).to_numpy(dtype='datetime64[D]')
+    scores = df['SENTIMENT_SCORE'].to_numpy(dtype='float64')
+    codes, products = product_codes(df['PRODUCT'])
+
+    valid = ~np.isnan(scores) & ~np.isnat(dates) & (codes >= 0)
+    scores, dates, codes = scores[valid], dates[valid], codes[valid]
+
+    columns = ['DATE', 'PRODUCT', 'SENTIMENT_SCORE', 'REVIEW_COUNT'] + (
+        [LABEL_COLUMNS[time_period]] if time_period in LABEL_COLUMNS else []
+    )
+    if scores.size == 0:
+        return pd.DataFrame(columns=columns)
+
+    periods = period_index(dates.astype(np.int64), time_period)
+    first_period = periods.min()
+    keys = (periods - first_period) * len(products) + codes
+    counts = np.bincount(keys)
+    sums = np.bincount(keys, weights=scores)
+
+    # Keys are ordered by period and then product, matching the sorted groupby output
+    present = np.flatnonzero(counts)
+    chart_data = pd.DataFrame({
+        'DATE': period_start(first_period + present // len(products), time_period),
+        'PRODUCT': np.asarray(products, dtype=object)[present % len(products)],
+        'SENTIMENT_SCORE': sums[present] / counts[present],
+        'REVIEW_COUNT': counts[present],
+    })
+
+    if time_period in LABEL_COLUMNS:
+        chart_data[LABEL_COLUMNS[time_period]] = period_labels(chart_data['DATE'], time_period)
+
+    return chart_data
+
+
+def period_encodings(time_period):
+    """Return the x axis and tooltip encodings for the selected time period."""
+    if time_period == "Daily":
+        x_encoding = alt.X('DATE:T', axis=alt.Axis(format='%Y-%m-%d', labelAngle=90))
+        tooltip_encoding = ['DATE:T', 'SENTIMENT_SCORE:Q', 'PRODUCT:N', 'REVIEW_COUNT:Q']
+    elif time_period == "Weekly":
+        x_encoding = alt.X('WEEK_LABEL:N', sort=None, title='Week')  # Use nominal type for explicit labels
+        tooltip_encoding = ['WEEK_LABEL:N', 'SENTIMENT_SCORE:Q', 'PRODUCT:N', 'REVIEW_COUNT:Q']
+    else:  # Monthly
+        x_encoding = alt.X('MONTH_LABEL:N', sort=None, title='Month')  # Use nominal type for explicit labels
+        tooltip_encoding = ['MONTH_LABEL:N', 'SENTIMENT_SCORE:Q', 'PRODUCT:N', 'REVIEW_COUNT:Q']
+    return x_encoding, tooltip_encoding
+
+
+def sentiment_metrics(chart_data, time_period=None):
+    """
+    Return the (average, highest, lowest) SENTIMENT_SCORE of the chart rows.
+
+    Daily metrics describe individual reviews, as they did when the Daily chart plotted raw
+    rows: with the REVIEW_COUNT, SCORE_SUM, SCORE_MIN and SCORE_MAX measures they come from
+    those instead of the per-day, per-product means. Weekly and Monthly metrics describe
+    the period means.
+    """
+    if time_period == "Daily" and {'SCORE_SUM', 'SCORE_MIN', 'SCORE_MAX'} <= set(chart_data.columns):
+        count = chart_data['REVIEW_COUNT'].sum()
+        if count == 0:
+            return np.nan, np.nan, np.nan
+        return chart_data['SCORE_SUM'].sum() / count, chart_data['SCORE_MAX'].max(), chart_data['SCORE_MIN'].min()
+
+    scores = chart_data['SENTIMENT_SCORE'].to_numpy(dtype='float64')
+    scores = scores[~np.isnan(scores)]
+    if scores.size == 0:
+        return np.nan, np.nan, np.nan
+    return scores.mean(), scores.max(), scores.min()
+
+
+def prepare_time_period_data(df, time_period):
+    """
+    Process data based on selected time period (Daily, Weekly, or Monthly).
+    """
+    chart_data = aggregate_time_period(df, time_period)
+    x_encoding, tooltip_encoding = period_encodings(time_period)
+    # The Daily metrics are taken over the raw review scores
+    avg_sentiment, highest_sentiment, lowest_sentiment = sentiment_metrics(df if time_period == "Daily" else chart_data)
+
+    return chart_data, x_encoding, tooltip_encoding, time_period, avg_sentiment, highest_sentiment, lowest_sentiment
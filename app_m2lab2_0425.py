@@ -1,6 +1,7 @@
 import streamlit as st
 import altair as alt
 import pandas as pd
+from aggregations import TIME_PERIODS, prepare_reviews, prepare_time_period_data
 
 st.set_page_config(page_title="Avalanche Data Set",
                     page_icon="🏔️",
@@ -10,17 +11,8 @@ st.title("🏔️ Avalanche Data Set")
 
 df = pd.read_csv("data/customer_reviews.csv")
 
-# Ensure SENTIMENT_SCORE is numeric
-df['SENTIMENT_SCORE'] = pd.to_numeric(df['SENTIMENT_SCORE'])
-
-# Convert DATE to datetime explicitly
-df['DATE'] = pd.to_datetime(df['DATE'])
-
-# Add date components
-df['DAY'] = df['DATE'].dt.day
-df['WEEK'] = df['DATE'].dt.isocalendar().week
-df['MONTH'] = df['DATE'].dt.month
-df['YEAR'] = df['DATE'].dt.year
+# Type the columns and add date components
+df = prepare_reviews(df)
 
 # Product sentiment score
 product_bar_chart = alt.Chart(df).mark_bar(size=15).encode(
@@ -53,44 +45,11 @@ with tab[0]:
     # Add time period selection
     time_period = st.selectbox(
         "Select time period",
-        options=["Daily", "Weekly", "Monthly"]
+        options=TIME_PERIODS
     )
 
     # Process data based on selected time period
-    if time_period == "Daily":
-        period_label = "Daily"
-        chart_data = df.copy()
-        x_encoding = alt.X('DATE:T', axis=alt.Axis(format='%Y-%m-%d', labelAngle=90))
-        tooltip_encoding = ['DATE:T', 'SENTIMENT_SCORE:Q', 'PRODUCT:N']
-        avg_sentiment = chart_data['SENTIMENT_SCORE'].mean()
-        highest_sentiment = chart_data['SENTIMENT_SCORE'].max()
-        lowest_sentiment = chart_data['SENTIMENT_SCORE'].min()
-
-    elif time_period == "Weekly":
-        period_label = "Weekly"
-        chart_data = df.groupby(['YEAR', 'WEEK', 'PRODUCT']).agg(
-            SENTIMENT_SCORE=('SENTIMENT_SCORE', 'mean'),
-            DATE=('DATE', 'first')
-        ).reset_index()
-        chart_data['WEEK_LABEL'] = chart_data.apply(lambda row: f"{row['YEAR']}-W{int(row['WEEK']):02d}", axis=1)
-        x_encoding = alt.X('WEEK_LABEL:N', sort=None, title='Week') # Use nominal type for explicit labels
-        tooltip_encoding = ['WEEK_LABEL:N', 'SENTIMENT_SCORE:Q', 'PRODUCT:N']
-        avg_sentiment = chart_data['SENTIMENT_SCORE'].mean()
-        highest_sentiment = chart_data['SENTIMENT_SCORE'].max()
-        lowest_sentiment = chart_data['SENTIMENT_SCORE'].min()
-
-    else:  # Monthly
-        period_label = "Monthly"
-        chart_data = df.groupby(['YEAR', 'MONTH', 'PRODUCT']).agg(
-            SENTIMENT_SCORE=('SENTIMENT_SCORE', 'mean'),
-            DATE=('DATE', 'first')
-        ).reset_index()
-        chart_data['MONTH_LABEL'] = chart_data.apply(lambda row: f"{row['YEAR']}-{row['MONTH']:02d}", axis=1)
-        x_encoding = alt.X('MONTH_LABEL:N', sort=None, title='Month') # Use nominal type for explicit labels
-        tooltip_encoding = ['MONTH_LABEL:N', 'SENTIMENT_SCORE:Q', 'PRODUCT:N']
-        avg_sentiment = chart_data['SENTIMENT_SCORE'].mean()
-        highest_sentiment = chart_data['SENTIMENT_SCORE'].max()
-        lowest_sentiment = chart_data['SENTIMENT_SCORE'].min()
+    chart_data, x_encoding, tooltip_encoding, period_label, avg_sentiment, highest_sentiment, lowest_sentiment = prepare_time_period_data(df, time_period)
 
     # Display metrics
     col1, col2, col3 = st.columns(3)
@@ -0,0 +1,67 @@
+"""
+Arrow-native fetching of Snowpark query results.
+Results are pulled as Arrow batches and cast to an explicit schema one batch at a time,
+so columns arrive in their final types (categorical products, float32 scores, native
+timestamps) instead of going through object columns that pandas has to re-parse.
+"""
+
+import pyarrow as pa
+
+# Arrow type of every CUSTOMER_REVIEWS column the app reads
+REVIEW_TYPES = {
+    "PRODUCT": pa.dictionary(pa.int32(), pa.string()),
+    "DATE": pa.timestamp("ns"),
+    "SUMMARY": pa.string(),
+    "SENTIMENT_SCORE": pa.float32(),
+}
+
+# Day x product aggregates read by the rollup; the measures are summed again when rolling
+# up, so they keep full precision
+DAILY_SCHEMA = pa.schema([
+    ("DATE", pa.timestamp("ns")),
+    ("PRODUCT", pa.string()),
+    ("REVIEW_COUNT", pa.int64()),
+    ("SCORE_SUM", pa.float64()),
+    ("SCORE_MIN", pa.float64()),
+    ("SCORE_MAX", pa.float64()),
+])
+
+
+def period_schema(label_column=None):
+    """Schema of `time_period_query` rows: the day x product measures, the mean score and the period label."""
+    schema = DAILY_SCHEMA.append(pa.field("SENTIMENT_SCORE", pa.float64()))
+    if label_column is not None:
+        schema = schema.append(pa.field(label_column, pa.string()))
+    return schema
+
+
+def review_schema(columns):
+    """Return the Arrow schema for the given CUSTOMER_REVIEWS columns."""
+    return pa.schema([(column, REVIEW_TYPES[column]) for column in columns])
+
+
+def fetch_arrow(query, schema):
+    """
+    Run a Snowpark DataFrame and collect its result as an Arrow table with `schema`.
+
+    Each batch is cast as it arrives, so the untyped result is never held in full.
+    Snowflake may send NUMBER columns with narrower integer types per batch; the cast
+    also makes every batch agree.
+
+    Args:
+        query (snowflake.snowpark.DataFrame): Query selecting at least the schema's columns.
+        schema (pa.Schema): Column names and types of the result.
+
+    Returns:
+        pa.Table: The result, empty when the query returned no rows.
+    """
+    tables = [batch.select(schema.names).cast(schema) for batch in query.to_arrow_batches()]
+    if not tables:
+        return schema.empty_table()
+    return pa.concat_tables(tables)
+
+
+def fetch_pandas(query, schema):
+    """Like `fetch_arrow`, converted to pandas; dictionary columns become categoricals."""
+    # Free each Arrow column as soon as it has been converted to keep peak memory down
+    return fetch_arrow(query, schema).to_pandas(split_blocks=True, self_destruct=True)
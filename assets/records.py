@@ -0,0 +1,135 @@
+"""
+Streaming reader for the markdown record sources used by split-files.py.
+Each source holds blocks of `Key: Value` lines separated by blank lines; other lines are
+ignored. Blocks are read one line at a time and yielded as typed, validated records, so
+memory stays flat however large the export is and every record is parsed exactly once.
+"""
+
+from datetime import date
+
+
+class RecordError(ValueError):
+    """A record is missing fields or holds values of the wrong type."""
+
+
+def parse_money(value):
+    return float(value.replace("$", "").replace(",", ""))
+
+
+class Record:
+    """A `Key: Value` block from a markdown source."""
+
+    kind = None
+    # Fields every record of this kind must have
+    REQUIRED = []
+    # Field name -> function raising ValueError for malformed values
+    CONVERTERS = {}
+
+    def __init__(self, index, line, fields, text):
+        self.index = index
+        self.line = line
+        self.fields = fields
+        self.text = text
+
+    def get(self, key, default=''):
+        return self.fields.get(key, default)
+
+    def validate(self):
+        """Raise RecordError describing every problem with this record."""
+        problems = []
+        for key in self.REQUIRED:
+            if not self.fields.get(key):
+                problems.append(f"missing '{key}'")
+        for key, convert in self.CONVERTERS.items():
+            if self.fields.get(key):
+                try:
+                    convert(self.fields[key])
+                except ValueError:
+                    problems.append(f"invalid '{key}': {self.fields[key]!r}")
+        if problems:
+            raise RecordError(f"{self.kind} record {self.index} (line {self.line}): " + "; ".join(problems))
+        return self
+
+
+class ProductRecord(Record):
+    kind = "product"
+    REQUIRED = ["Product Name", "Description", "Price"]
+    CONVERTERS = {"Price": parse_money}
+
+
+class ReviewRecord(Record):
+    kind = "review"
+    REQUIRED = ["Product Name", "Review", "Date"]
+    CONVERTERS = {"Date": date.fromisoformat}
+
+
+class OrderRecord(Record):
+    kind = "order"
+    REQUIRED = ["Order ID", "Customer ID", "Product Name", "Quantity Ordered", "Price", "Total Price", "Date"]
+    CONVERTERS = {
+        "Order ID": int,
+        "Customer ID": int,
+        "Quantity Ordered": int,
+        "Price": parse_money,
+        "Total Price": parse_money,
+        "Date": date.fromisoformat,
+    }
+
+
+class ShippingRecord(Record):
+    kind = "shipping"
+    REQUIRED = ["Order ID", "Shipping Date", "Carrier", "Tracking Number", "Status"]
+    CONVERTERS = {
+        "Order ID": int,
+        "Shipping Date": date.fromisoformat,
+        "Latitude": float,
+        "Longitude": float,
+    }
+
+
+RECORD_TYPES = {cls.kind: cls for cls in [ProductRecord, ReviewRecord, OrderRecord, ShippingRecord]}
+
+
+def parse_records(lines, kind):
+    """
+    Yield the records of markdown source lines one block at a time.
+
+    Records are not validated here, so one malformed block does not stop the stream; call
+    `validate()` on each record to check it. Lines without a colon are skipped.
+
+    Args:
+        lines (iterable): Source lines, e.g. an open file or `content.splitlines()`.
+        kind (str): Record type, one of RECORD_TYPES.
+
+    Yields:
+        Record: The next record, numbered from 1 in source order.
+    """
+    record_type = RECORD_TYPES[kind]
+    index = 0
+    block, fields, start = [], {}, None
+
+    for number, line in enumerate(lines, 1):
+        line = line.rstrip("\n")
+        if not line.strip():
+            if block:
+                index += 1
+                yield record_type(index, start, fields, "\n".join(block))
+                block, fields, start = [], {}, None
+            continue
+
+        if start is None:
+            start = number
+        block.append(line)
+        if ':' in line:
+            key, value = line.split(':', 1)
+            fields[key.strip()] = value.strip()
+
+    if block:
+        index += 1
+        yield record_type(index, start, fields, "\n".join(block))
+
+
+def read_records(path, kind):
+    """Yield the records of a markdown source file, see `parse_records`."""
+    with open(path, 'r') as f:
+        yield from parse_records(f, kind)
@@ -4,7 +4,13 @@ Requirements: reportlab, python-docx
 Install with: pip install reportlab python-docx
 """
 
+import argparse
+import hashlib
+import json
 import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from reportlab import rl_config
 from reportlab.lib import colors
 from reportlab.lib.pagesizes import letter
 from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
@@ -13,6 +19,11 @@ from reportlab.lib.units import inch
 from docx import Document
 from docx.shared import Pt, RGBColor
 from docx.enum.text import WD_ALIGN_PARAGRAPH
+from records import parse_records, read_records
+from stage_upload import upload_generated
+
+# Identical input renders to byte-identical PDFs, whichever process renders it and when
+rl_config.invariant = 1
 
 class PDFGenerator:
     def __init__(self):
@@ -56,7 +67,7 @@ class PDFGenerator:
             textColor=colors.HexColor('#333333')
         )
 
-    def create_product_pdf(self, content, filename):
+    def create_product_pdf(self, data, filename):
         """Create a PDF product specification."""
         doc = SimpleDocTemplate(filename, pagesize=letter,
                               rightMargin=72, leftMargin=72,
@@ -68,14 +79,6 @@ class PDFGenerator:
         story.append(Paragraph("PRODUCT SPECIFICATION", self.header_style))
         story.append(Spacer(1, 0.2 * inch))
         
-        # Parse content
-        lines = content.strip().split('\n')
-        data = {}
-        for line in lines:
-            if ':' in line:
-                key, value = line.split(':', 1)
-                data[key.strip()] = value.strip()
-        
         # Product name
         story.append(Paragraph(data.get('Product Name', ''), self.header_style))
         story.append(Spacer(1, 0.1 * inch))
@@ -103,7 +106,7 @@ class PDFGenerator:
         
         doc.build(story)
 
-    def create_order_pdf(self, content, filename):
+    def create_order_pdf(self, data, filename):
         """Create a PDF invoice for orders."""
         doc = SimpleDocTemplate(filename, pagesize=letter,
                               rightMargin=72, leftMargin=72,
@@ -116,14 +119,6 @@ class PDFGenerator:
         story.append(Paragraph("ORDER INVOICE", self.header_style))
         story.append(Spacer(1, 0.2 * inch))
         
-        # Parse content into dictionary
-        lines = content.strip().split('\n')
-        data = {}
-        for line in lines:
-            if ':' in line:
-                key, value = line.split(':', 1)
-                data[key.strip()] = value.strip()
-        
         # Create order info table
         order_info = [
             [Paragraph("Order ID:", self.label_style), 
@@ -169,7 +164,7 @@ class PDFGenerator:
         
         doc.build(story)
 
-    def create_shipping_pdf(self, content, filename):
+    def create_shipping_pdf(self, data, filename):
         """Create a PDF shipping receipt."""
         doc = SimpleDocTemplate(filename, pagesize=letter,
                               rightMargin=72, leftMargin=72,
@@ -181,14 +176,6 @@ class PDFGenerator:
         story.append(Paragraph("SHIPPING RECEIPT", self.header_style))
         story.append(Spacer(1, 0.2 * inch))
         
-        # Parse content
-        lines = content.strip().split('\n')
-        data = {}
-        for line in lines:
-            if ':' in line:
-                key, value = line.split(':', 1)
-                data[key.strip()] = value.strip()
-        
         # Create shipping info table
         shipping_info = [
             ['Tracking Information', ''],
@@ -217,110 +204,260 @@ class PDFGenerator:
         
         doc.build(story)
 
+def create_review_docx(data, filename):
+    """Create a DOCX file for a single customer review."""
+    # Create a new document
+    doc = Document()
+
+    product_name = data.get('Product Name', '')
+    review_text = data.get('Review', '').strip('"')
+    review_date = data.get('Date', '')
+
+    # Add title
+    title = doc.add_heading(level=1)
+    title_run = title.add_run('Product Review')
+    title_run.font.size = Pt(18)
+    title_run.font.color.rgb = RGBColor(26, 77, 124)  # Dark blue
+
+    # Add product name
+    product_para = doc.add_paragraph()
+    product_run = product_para.add_run('Product: ')
+    product_run.bold = True
+    product_para.add_run(product_name)
+
+    # Add date
+    date_para = doc.add_paragraph()
+    date_run = date_para.add_run('Date: ')
+    date_run.bold = True
+    date_para.add_run(review_date)
+
+    # Add spacing
+    doc.add_paragraph()
+
+    # Add review header
+    review_header = doc.add_paragraph()
+    review_header_run = review_header.add_run('Customer Review')
+    review_header_run.bold = True
+
+    # Add review text
+    review_para = doc.add_paragraph()
+    review_para.add_run(review_text)
+
+    # Save the document
+    doc.save(filename)
+
 def split_customer_reviews(content, output_dir="customer-reviews"):
-    """Split customer reviews into individual DOCX files."""
+    """Split customer reviews markdown content into individual DOCX files."""
+    write_reviews(parse_records(content.splitlines(), "review"), output_dir)
+
+def split_customer_reviews_file(source="customer-reviews.md", output_dir="customer-reviews"):
+    """Like split_customer_reviews, streaming the reviews from a markdown file."""
+    write_reviews(read_records(source, "review"), output_dir)
+
+def write_reviews(reviews, output_dir):
     os.makedirs(output_dir, exist_ok=True)
-    
-    reviews = content.strip().split("\n\n")
-    
-    for i, review in enumerate(reviews, 1):
-        filename = os.path.join(output_dir, f"review-{i:02d}.docx")
-        
-        # Create a new document
-        doc = Document()
-        
-        # Parse review content
-        lines = review.strip().split('\n')
-        product_name = ''
-        review_text = ''
-        review_date = ''
-        
-        for line in lines:
-            if line.startswith('Product Name:'):
-                product_name = line.split(':', 1)[1].strip()
-            elif line.startswith('Review:'):
-                review_text = line.split(':', 1)[1].strip().strip('"')
-            elif line.startswith('Date:'):
-                review_date = line.split(':', 1)[1].strip()
-        
-        # Add title
-        title = doc.add_heading(level=1)
-        title_run = title.add_run('Product Review')
-        title_run.font.size = Pt(18)
-        title_run.font.color.rgb = RGBColor(26, 77, 124)  # Dark blue
-        
-        # Add product name
-        product_para = doc.add_paragraph()
-        product_run = product_para.add_run('Product: ')
-        product_run.bold = True
-        product_para.add_run(product_name)
-        
-        # Add date
-        date_para = doc.add_paragraph()
-        date_run = date_para.add_run('Date: ')
-        date_run.bold = True
-        date_para.add_run(review_date)
-        
-        # Add spacing
-        doc.add_paragraph()
-        
-        # Add review header
-        review_header = doc.add_paragraph()
-        review_header_run = review_header.add_run('Customer Review')
-        review_header_run.bold = True
-        
-        # Add review text
-        review_para = doc.add_paragraph()
-        review_para.add_run(review_text)
-        
-        # Save the document
-        doc.save(filename)
+    for review in reviews:
+        filename = os.path.join(output_dir, f"review-{review.index:02d}.docx")
+        create_review_docx(review.validate().fields, filename)
 
-def process_files():
-    """Process all files and generate PDFs/DOCX files."""
-    pdf_gen = PDFGenerator()
-    
+# Source file, output directory, file name pattern, record type and renderer of each document type
+DOCUMENT_TYPES = [
+    ("Product Catalog", "product-catalog.md", "product-catalog", "product-{:02d}.pdf", "product", "create_product_pdf"),
+    ("Customer Reviews", "customer-reviews.md", "customer-reviews", "review-{:02d}.docx", "review", "create_review_docx"),
+    ("Order History", "order-history.md", "order-history", "order-{:02d}.pdf", "order", "create_order_pdf"),
+    ("Shipping Logs", "shipping-logs.md", "shipping-logs", "shipping-{:02d}.pdf", "shipping", "create_shipping_pdf"),
+]
+
+# Records rendered per work unit sent to a worker process
+CHUNK_SIZE = 8
+
+# Bump when layouts or styles change, so every document is rendered again
+GENERATOR_VERSION = "1"
+
+# Content hash of every generated file, used to skip records that did not change
+MANIFEST_PATH = ".build-manifest.json"
+
+# PDFGenerator of the current worker process, created once by init_worker
+_pdf_gen = None
+
+def init_worker():
+    """Create the per-process PDFGenerator, so styles are built once per worker."""
+    global _pdf_gen
+    _pdf_gen = PDFGenerator()
+
+def render_record(pdf_gen, renderer, data, filename):
+    if renderer == "create_review_docx":
+        create_review_docx(data, filename)
+    else:
+        getattr(pdf_gen, renderer)(data, filename)
+
+def render_chunk(tasks):
+    """
+    Validate and render a chunk of records, catching errors per record.
+
+    Args:
+        tasks (list): (document type, renderer, record, filename) tuples.
+
+    Returns:
+        list: (document type, index, filename, error message or None) per record.
+    """
+    if _pdf_gen is None:
+        init_worker()
+    results = []
+    for doc_type, renderer, record, filename in tasks:
+        try:
+            render_record(_pdf_gen, renderer, record.validate().fields, filename)
+            results.append((doc_type, record.index, filename, None))
+        except Exception as e:
+            results.append((doc_type, record.index, filename, str(e)))
+    return results
+
+def iter_tasks(read_types):
+    """
+    Stream one render task per record of every markdown source.
+    The document type of every source that could be read, including empty ones, is added
+    to `read_types` once its records have been streamed.
+    """
+    for doc_type, source, output_dir, pattern, kind, renderer in DOCUMENT_TYPES:
+        try:
+            for record in read_records(source, kind):
+                if record.index == 1:
+                    os.makedirs(output_dir, exist_ok=True)
+                yield doc_type, renderer, record, os.path.join(output_dir, pattern.format(record.index))
+            read_types.add(doc_type)
+        except FileNotFoundError as e:
+            print(f"Error: File not found - {e.filename}")
+
+def record_hash(renderer, text):
+    return hashlib.sha256(f"{renderer}\0{text}".encode("utf-8")).hexdigest()
+
+def load_manifest(path=MANIFEST_PATH):
+    """
+    Return the {filename: {"type", "hash"}} entries of the last build.
+    Entries written by another GENERATOR_VERSION have no hash, so every record is rendered
+    again while their files can still be found as orphans.
+    """
     try:
-        # Create output directories with names matching MD files
-        os.makedirs("product-catalog", exist_ok=True)
-        os.makedirs("customer-reviews", exist_ok=True)
-        os.makedirs("order-history", exist_ok=True)
-        os.makedirs("shipping-logs", exist_ok=True)
-
-        # Process Product Catalog (PDF)
-        with open("product-catalog.md", 'r') as f:
-            products = f.read().strip().split("\n\n")
-            for i, product in enumerate(products, 1):
-                filename = os.path.join("product-catalog", f"product-{i:02d}.pdf")
-                pdf_gen.create_product_pdf(product, filename)
-        print("Successfully processed Product Catalog")
-
-        # Process Customer Reviews (DOCX)
-        with open("customer-reviews.md", 'r') as f:
-            content = f.read()
-            split_customer_reviews(content)
-        print("Successfully processed Customer Reviews")
-
-        # Process Order History (PDF)
-        with open("order-history.md", 'r') as f:
-            orders = f.read().strip().split("\n\n")
-            for i, order in enumerate(orders, 1):
-                filename = os.path.join("order-history", f"order-{i:02d}.pdf")
-                pdf_gen.create_order_pdf(order, filename)
-        print("Successfully processed Order History")
-
-        # Process Shipping Logs (PDF)
-        with open("shipping-logs.md", 'r') as f:
-            logs = f.read().strip().split("\n\n")
-            for i, log in enumerate(logs, 1):
-                filename = os.path.join("shipping-logs", f"shipping-{i:02d}.pdf")
-                pdf_gen.create_shipping_pdf(log, filename)
-        print("Successfully processed Shipping Logs")
-
-    except FileNotFoundError as e:
-        print(f"Error: File not found - {e.filename}")
-    except Exception as e:
-        print(f"Error processing files: {str(e)}")
+        with open(path, 'r') as f:
+            manifest = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+    outputs = manifest.get("outputs", {})
+    if manifest.get("generator_version") != GENERATOR_VERSION:
+        return {filename: {"type": entry["type"], "hash": None} for filename, entry in outputs.items()}
+    return outputs
+
+def save_manifest(outputs, path=MANIFEST_PATH):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump({"generator_version": GENERATOR_VERSION, "outputs": outputs}, f, indent=1, sort_keys=True)
+    os.replace(tmp_path, path)
+
+def remove_orphans(previous, current, read_types):
+    """Delete outputs of earlier builds whose record no longer exists in its (readable) source."""
+    orphans = [
+        filename for filename, entry in previous.items()
+        if filename not in current and entry["type"] in read_types
+    ]
+    for filename in orphans:
+        if os.path.exists(filename):
+            os.remove(filename)
+    return orphans
+
+def process_files(workers=1, chunk_size=CHUNK_SIZE, force=False):
+    """
+    Process all files and generate PDFs/DOCX files.
+
+    Records are streamed from the sources and parsed once. Only records that are new or
+    changed since the last build are rendered: the build manifest keeps a content hash per
+    output file together with GENERATOR_VERSION, and outputs whose record disappeared are
+    deleted. Records are rendered in chunks of `chunk_size`, across `workers` processes
+    when more than one is requested, with at most two chunks per worker in flight so
+    memory stays flat with input size. Every record reports its own success or failure,
+    and results are reported in source order whatever order the workers finish in.
+
+    Args:
+        workers (int): Number of worker processes; 1 renders in this process.
+        chunk_size (int): Records per work unit.
+        force (bool): Render every record, ignoring the manifest.
+
+    Returns:
+        tuple: (document type, index, filename, error message or None) per rendered record,
+        and the orphaned files that were removed.
+    """
+    previous = load_manifest()
+    read_types = set()
+    outputs = {}
+    results = []
+    total = 0
+    in_flight = deque()
+    executor = ProcessPoolExecutor(max_workers=workers, initializer=init_worker) if workers > 1 else None
+
+    def submit(chunk):
+        if executor is None:
+            results.extend(render_chunk(chunk))
+            return
+        in_flight.append(executor.submit(render_chunk, chunk))
+        while len(in_flight) > 2 * workers:
+            results.extend(in_flight.popleft().result())
+
+    try:
+        chunk = []
+        for task in iter_tasks(read_types):
+            doc_type, renderer, record, filename = task
+            total += 1
+            outputs[filename] = {"type": doc_type, "hash": record_hash(renderer, record.text)}
+            unchanged = previous.get(filename, {}).get("hash") == outputs[filename]["hash"]
+            if unchanged and not force and os.path.exists(filename):
+                continue
+            chunk.append(task)
+            if len(chunk) == chunk_size:
+                submit(chunk)
+                chunk = []
+        if chunk:
+            submit(chunk)
+        while in_flight:
+            results.extend(in_flight.popleft().result())
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    for doc_type, *_ in DOCUMENT_TYPES:
+        type_results = [r for r in results if r[0] == doc_type]
+        if not type_results:
+            continue
+        failures = [r for r in type_results if r[3] is not None]
+        for _, index, filename, error in failures:
+            print(f"Error processing {filename}: {error}")
+        if failures:
+            print(f"Processed {doc_type} with {len(failures)} of {len(type_results)} records failing")
+        else:
+            print(f"Successfully processed {doc_type}")
+
+    orphans = remove_orphans(previous, outputs, read_types)
+
+    # Failed records stay out of the manifest, so the next run retries them
+    for _, _, filename, error in results:
+        if error is not None:
+            del outputs[filename]
+    # Keep entries of sources that could not be read this time
+    outputs.update({f: e for f, e in previous.items() if e["type"] not in read_types})
+    save_manifest(outputs)
+
+    print(f"Rendered {len(results)} of {total} records, removed {len(orphans)} orphaned files")
+    return results, orphans
 
 if __name__ == "__main__":
-    process_files()
+    parser = argparse.ArgumentParser(description="Generate PDFs/DOCX files from the markdown sources.")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="number of worker processes (1 renders in this process)")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE,
+                        help="records per work unit")
+    parser.add_argument("--force", action="store_true",
+                        help="render every record, ignoring the build manifest")
+    parser.add_argument("--upload", metavar="STAGE",
+                        help="upload the generated files to this stage (or local directory) afterwards")
+    args = parser.parse_args()
+    _, orphans = process_files(workers=args.workers, chunk_size=args.chunk_size, force=args.force)
+    if args.upload:
+        upload_generated(args.upload, [output_dir for _, _, output_dir, *_ in DOCUMENT_TYPES], removed=orphans)
@@ -0,0 +1,170 @@
+"""
+Upload generated documents to the customer_reviews stage.
+Local MD5 hashes are compared against the stage listing, so unchanged files are skipped,
+and the remaining files are PUT concurrently without compression (PARSE_DOCUMENT reads
+the files as they are). Files split-files.py removed as orphans are removed from the stage
+too. A plain directory can stand in for the stage when testing.
+
+Usage: python stage_upload.py [STAGE] [--dirs DIR ...] [--workers N]
+"""
+
+import argparse
+import hashlib
+import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+
+STAGE = "@avalanche_db.avalanche_schema.customer_reviews"
+
+# Output directories of split-files.py
+GENERATED_DIRS = ["product-catalog", "customer-reviews", "order-history", "shipping-logs"]
+
+# Upper bound on concurrent PUT commands
+MAX_UPLOAD_WORKERS = 8
+
+
+def file_md5(path, block_size=1 << 20):
+    digest = hashlib.md5()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class SnowflakeStage:
+    """Internal Snowflake stage; files are stored at the stage root."""
+
+    def __init__(self, session, stage=STAGE):
+        self.session = session
+        self.stage = stage
+
+    def list(self):
+        """Return {file name: {"size", "md5"}} from LIST @stage."""
+        files = {}
+        for row in self.session.sql(f"LIST {self.stage}").collect():
+            # Names are reported as "<stage name>/<path>"
+            name = row["name"].split("/", 1)[1]
+            files[name] = {"size": row["size"], "md5": row["md5"]}
+        return files
+
+    def put(self, path):
+        result = self.session.file.put(path, self.stage, parallel=1, auto_compress=False, overwrite=True)[0]
+        if result.status not in ("UPLOADED", "SKIPPED"):
+            raise RuntimeError(f"PUT {path} returned {result.status}: {result.message}")
+
+    def remove(self, name):
+        self.session.sql(f"REMOVE {self.stage}/{name}").collect()
+
+
+class LocalStage:
+    """Directory standing in for a stage, for testing the upload without Snowflake."""
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+
+    def list(self):
+        return {
+            name: {"size": os.path.getsize(os.path.join(self.path, name)),
+                   "md5": file_md5(os.path.join(self.path, name))}
+            for name in os.listdir(self.path)
+            if os.path.isfile(os.path.join(self.path, name))
+        }
+
+    def put(self, path):
+        shutil.copyfile(path, os.path.join(self.path, os.path.basename(path)))
+
+    def remove(self, name):
+        os.remove(os.path.join(self.path, name))
+
+
+def open_stage(location):
+    """Open a Snowflake stage for "@..." locations and a LocalStage for anything else."""
+    if location.startswith("@"):
+        from snowflake.snowpark import Session
+        return SnowflakeStage(Session.builder.getOrCreate(), location)
+    return LocalStage(location)
+
+
+def generated_files(dirs=GENERATED_DIRS):
+    """List the files in the generated output directories, in a stable order."""
+    files = []
+    for directory in dirs:
+        if os.path.isdir(directory):
+            files.extend(
+                os.path.join(directory, name) for name in sorted(os.listdir(directory))
+                if os.path.isfile(os.path.join(directory, name))
+            )
+    return files
+
+
+def upload_files(stage, files, max_workers=MAX_UPLOAD_WORKERS):
+    """
+    Upload files whose size or MD5 differs from the stage copy.
+
+    Args:
+        stage: SnowflakeStage or LocalStage.
+        files (list): Local file paths; each is stored under its base name.
+        max_workers (int): Maximum number of concurrent uploads.
+
+    Returns:
+        tuple: (uploaded, skipped, failed) lists; failed holds (path, error message) pairs.
+    """
+    listing = stage.list()
+    pending, skipped = [], []
+    for path in files:
+        staged = listing.get(os.path.basename(path))
+        if staged and staged["size"] == os.path.getsize(path) and staged["md5"] == file_md5(path):
+            skipped.append(path)
+        else:
+            pending.append(path)
+
+    def upload(path):
+        try:
+            stage.put(path)
+            return path, None
+        except Exception as e:
+            return path, str(e)
+
+    uploaded, failed = [], []
+    if pending:
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(pending))) as executor:
+            for path, error in executor.map(upload, pending):
+                if error is None:
+                    uploaded.append(path)
+                else:
+                    failed.append((path, error))
+    return uploaded, skipped, failed
+
+
+def remove_files(stage, paths):
+    """Remove the stage copies of deleted local files; returns the names that were staged."""
+    listing = stage.list()
+    names = [os.path.basename(path) for path in paths if os.path.basename(path) in listing]
+    for name in names:
+        stage.remove(name)
+    return names
+
+
+def upload_generated(location=STAGE, dirs=GENERATED_DIRS, max_workers=MAX_UPLOAD_WORKERS, removed=()):
+    """Upload the generated documents to `location`, remove the `removed` files from it and print a summary."""
+    stage = open_stage(location)
+    uploaded, skipped, failed = upload_files(stage, generated_files(dirs), max_workers)
+    for path, error in failed:
+        print(f"Error uploading {path}: {error}")
+    unstaged = remove_files(stage, removed) if removed else []
+    print(f"Uploaded {len(uploaded)} files to {location}, skipped {len(skipped)} unchanged, {len(failed)} failed, "
+          f"removed {len(unstaged)}")
+    return uploaded, skipped, failed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Upload generated documents to a stage.")
+    parser.add_argument("stage", nargs="?", default=STAGE,
+                        help="stage name (\"@db.schema.stage\") or a local directory standing in for it")
+    parser.add_argument("--dirs", nargs="+", default=GENERATED_DIRS,
+                        help="directories whose files are uploaded")
+    parser.add_argument("--workers", type=int, default=MAX_UPLOAD_WORKERS,
+                        help="maximum number of concurrent uploads")
+    args = parser.parse_args()
+    upload_generated(args.stage, args.dirs, args.workers)
@@ -0,0 +1,252 @@
+"""
+Offline benchmark suite for the dashboard, chatbot and document generation hot paths.
+Runs on synthetic CUSTOMER_REVIEWS data (benchmarks/synthetic.py) and a mock Snowpark
+session (benchmarks/mock_session.py), so no Snowflake account is needed. Every stage is
+timed (best of --repeat) and the results are written as a JSON report that can be
+compared with an earlier one.
+
+Run from the repository root:
+    python benchmarks/bench_suite.py --rows 10000 1000000 --output bench.json
+    python benchmarks/bench_suite.py --rows 10000 1000000 --compare bench.json
+    python benchmarks/bench_suite.py --rows 10000000 --repeat 1 --skip legacy prompt render
+
+The "load" stages include the snapshot and rollup refreshes, fetched as Arrow batches from
+the mock session. The "legacy" stages time the original per-row implementations from
+bench_time_periods.py on the same rows as the current "load" and "aggregate" stages.
+"""
+
+import argparse
+import importlib.util
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+from datetime import datetime, timezone
+
+import pyarrow as pa
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from aggregations import TIME_PERIODS, period_encodings, prepare_reviews, prepare_time_period_data  # noqa: E402
+from bench_time_periods import best_time, legacy_prepare_reviews, legacy_time_period_data  # noqa: E402
+from charts import product_bar_chart, sentiment_chart  # noqa: E402
+from completions import CortexBackend  # noqa: E402
+from context_assembly import assemble_context  # noqa: E402
+from data_browser import filter_reviews, review_page  # noqa: E402
+from mock_session import MockSearchService, MockSession  # noqa: E402
+from queries import REVIEW_COLUMNS  # noqa: E402
+from rag_pipeline import answer_prompt, retrieve, summary_prompt  # noqa: E402
+from review_snapshot import TEXT_SNAPSHOT_COLUMNS, ReviewSnapshot  # noqa: E402
+from rollup import LABEL_COLUMNS, SentimentRollup  # noqa: E402
+from synthetic import daily_cube, make_reviews, review_texts  # noqa: E402
+
+STAGE_GROUPS = ["load", "aggregate", "legacy", "rollup", "chart", "browser", "prompt", "render"]
+
+
+class Report:
+    def __init__(self):
+        self.results = []
+
+    def add(self, stage, seconds, rows=None, calls=None):
+        """Record a stage; throughput is rows/s for data stages and calls/s otherwise."""
+        units = rows or calls or 1
+        result = {"stage": stage, "rows": rows, "calls": calls, "seconds": seconds,
+                  "per_second": units / seconds if seconds else None}
+        self.results.append(result)
+        size = f"{rows:,} rows" if rows else f"{calls} calls"
+        print(f"{stage:<28} {size:>16} {seconds * 1000:>12.2f} ms {result['per_second'] or 0:>16,.0f}/s")
+        return result
+
+
+def bench_dashboard(report, rows, repeat, groups):
+    """Data-size dependent stages: loading, time bucketing, rollup, charts and paging."""
+    raw = make_reviews(rows)
+
+    if "load" in groups:
+        report.add("load.prepare_reviews", best_time(lambda: prepare_reviews(raw.copy()), repeat), rows=rows)
+
+        # Cold-start refreshes through session.table(...).to_arrow_batches() and fetch_arrow
+        session = MockSession(reviews=raw)
+        session.arrow_table(), session.arrow_table(grouped=True)
+        with tempfile.TemporaryDirectory() as cache_dir:
+            for name, columns in [("snapshot", REVIEW_COLUMNS), ("text_snapshot", TEXT_SNAPSHOT_COLUMNS)]:
+                path = os.path.join(cache_dir, f"{name}.parquet")
+                report.add(f"load.{name}_refresh", best_time(
+                    lambda: ReviewSnapshot(path=path, columns=columns).refresh(session), repeat
+                ), rows=rows)
+        report.add("load.rollup_refresh", best_time(lambda: SentimentRollup().refresh(session), repeat),
+                   rows=session.arrow_table(grouped=True).num_rows)
+
+    if "aggregate" in groups:
+        df = prepare_reviews(raw.copy())
+        for time_period in TIME_PERIODS:
+            report.add(f"aggregate.{time_period}",
+                       best_time(lambda: prepare_time_period_data(df, time_period), repeat), rows=rows)
+
+    if "legacy" in groups:
+        report.add("legacy.load.prepare_reviews",
+                   best_time(lambda: legacy_prepare_reviews(raw.copy()), repeat), rows=rows)
+        legacy_df = legacy_prepare_reviews(raw.copy())
+        for time_period in TIME_PERIODS:
+            report.add(f"legacy.aggregate.{time_period}",
+                       best_time(lambda: legacy_time_period_data(legacy_df, time_period), repeat), rows=rows)
+
+    rollup = SentimentRollup()
+    daily = daily_cube(raw)
+
+    def build_rollup():
+        rollup.cube = {"Daily": daily}
+        for time_period in LABEL_COLUMNS:
+            rollup.cube[time_period] = rollup._roll_up(daily, time_period, None)
+
+    build_rollup()
+    if "rollup" in groups:
+        report.add("rollup.build", best_time(build_rollup, repeat), rows=len(daily))
+        for time_period in TIME_PERIODS:
+            report.add(f"rollup.time_period.{time_period}",
+                       best_time(lambda: rollup.time_period(time_period), repeat), rows=len(daily))
+
+    if "chart" in groups:
+        for time_period in TIME_PERIODS:
+            chart_data = rollup.time_period(time_period)
+            x_encoding, tooltip_encoding = period_encodings(time_period)
+            report.add(f"chart.spec.{time_period}", best_time(
+                lambda: sentiment_chart(chart_data, x_encoding, tooltip_encoding).to_dict(), repeat
+            ), rows=len(chart_data))
+        product_data = rollup.products()
+        report.add("chart.spec.Product", best_time(lambda: product_bar_chart(product_data).to_dict(), repeat),
+                   rows=len(product_data))
+
+    if "browser" in groups:
+        report.add("browser.to_arrow", best_time(lambda: pa.Table.from_pandas(raw, preserve_index=False), repeat),
+                   rows=rows)
+        table = pa.Table.from_pandas(raw, preserve_index=False)
+        products = sorted(raw['PRODUCT'].unique())[:3]
+        dates = (raw['DATE'].min(), raw['DATE'].max())
+
+        def browse():
+            filtered = filter_reviews(table, products, dates, (-0.5, 1.0))
+            return review_page(filtered, 1, 100, "SENTIMENT_SCORE", True)
+
+        report.add("browser.filter_page", best_time(browse, repeat), rows=rows)
+
+
+def bench_prompt(report, repeat, calls=20, latency=0.0):
+    """create_prompt's assembly: history rewrite, retrieval, context packing and prompt."""
+    session = MockSession(latency=latency)
+    backend = CortexBackend(session)
+    chunks = [text for texts in review_texts().values() for text in texts]
+    service = MockSearchService(chunks, latency=latency)
+    model = "mistral-large"
+    history = [
+        {"role": "user", "content": "Are there any goggles review?"},
+        {"role": "assistant", "content": "Yes, several reviews mention goggles."},
+    ]
+
+    def create_prompt():
+        retrieval = retrieve(
+            "Do they fog up in cold weather?",
+            history,
+            summarize=lambda chat_history, question: backend.complete(model, summary_prompt(chat_history, question)),
+            search=lambda query: service.search(query, limit=20),
+            limit=20,
+        )
+        assembly = assemble_context(retrieval.documents, model)
+        return answer_prompt(history, assembly.context, "Do they fog up in cold weather?")
+
+    report.add("prompt.create", best_time(lambda: [create_prompt() for _ in range(calls)], repeat) / calls, calls=1)
+
+
+def load_split_files():
+    """Import assets/split-files.py, whose name is not a valid module name."""
+    sys.path.insert(0, os.path.join(ROOT, "assets"))
+    spec = importlib.util.spec_from_file_location("split_files", os.path.join(ROOT, "assets", "split-files.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def bench_render(report, repeat):
+    """Render every record of each markdown source with the split-files renderers."""
+    split_files = load_split_files()
+    from records import read_records
+
+    pdf_gen = split_files.PDFGenerator()
+    with tempfile.TemporaryDirectory() as output_dir:
+        for doc_type, source, _, pattern, kind, renderer in split_files.DOCUMENT_TYPES:
+            records = [r.validate() for r in read_records(os.path.join(ROOT, "assets", source), kind)]
+
+            def render():
+                for record in records:
+                    filename = os.path.join(output_dir, pattern.format(record.index))
+                    split_files.render_record(pdf_gen, renderer, record.fields, filename)
+
+            seconds = best_time(render, repeat)
+            report.add(f"render.{kind}", seconds / len(records), calls=1)
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline_path):
+    """Print the speed ratio of every stage against a previous report."""
+    with open(baseline_path) as f:
+        baseline = {(r["stage"], r["rows"]): r for r in json.load(f)["results"]}
+    print(f"\n{'stage':<28} {'rows':>12} {'baseline ms':>12} {'current ms':>12} {'change':>8}")
+    for result in results:
+        old = baseline.get((result["stage"], result["rows"]))
+        if old is None:
+            continue
+        change = old["seconds"] / result["seconds"] if result["seconds"] else float("inf")
+        print(f"{result['stage']:<28} {result['rows'] or '':>12} {old['seconds'] * 1000:>12.2f} "
+              f"{result['seconds'] * 1000:>12.2f} {change:>7.2f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 1_000_000])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--skip", nargs="+", default=[], choices=STAGE_GROUPS, help="stage groups to skip")
+    parser.add_argument("--latency", type=float, default=0.0,
+                        help="simulated seconds per mock Snowflake round trip in the prompt stage")
+    parser.add_argument("--output", help="write the JSON report to this file")
+    parser.add_argument("--compare", help="compare with an earlier JSON report")
+    args = parser.parse_args()
+    groups = [group for group in STAGE_GROUPS if group not in args.skip]
+
+    report = Report()
+    for rows in args.rows:
+        bench_dashboard(report, rows, args.repeat, groups)
+    if "prompt" in groups:
+        bench_prompt(report, args.repeat, latency=args.latency)
+    if "render" in groups:
+        bench_render(report, args.repeat)
+
+    document = {
+        "meta": {
+            "commit": git_commit(),
+            "created": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "args": vars(args),
+        },
+        "results": report.results,
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(document, f, indent=2)
+    if args.compare:
+        compare(report.results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
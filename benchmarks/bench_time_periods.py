@@ -0,0 +1,114 @@
+"""
+Benchmark the time period aggregation used by the dashboard apps.
+Compares the original per-row `apply` implementation with the vectorized one in
+aggregations.py and prints rows per second for loading and for each time period.
+The original Daily view charted the raw rows (a plain copy); it now aggregates per
+day and product, so its numbers compare different amounts of work.
+
+The legacy functions are also measured by bench_suite.py ("legacy" stages), at the same
+row counts as the current stages there. Both benchmarks generate rows with
+synthetic.make_reviews and time stages with `best_time`.
+
+Run from the repository root:
+    python benchmarks/bench_time_periods.py --rows 10000 1000000
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from aggregations import TIME_PERIODS, prepare_reviews, prepare_time_period_data  # noqa: E402
+from synthetic import make_reviews  # noqa: E402
+
+
+def csv_reviews(rows):
+    """Generate `rows` synthetic reviews with the columns and string dates read from the CSV."""
+    reviews = make_reviews(rows)[['PRODUCT', 'DATE', 'SENTIMENT_SCORE']]
+    return reviews.assign(DATE=reviews['DATE'].dt.strftime('%Y-%m-%d'))
+
+
+def legacy_prepare_reviews(df):
+    """The original load-time processing, kept as the baseline."""
+    df['SENTIMENT_SCORE'] = pd.to_numeric(df['SENTIMENT_SCORE'])
+    df['DATE'] = pd.to_datetime(df['DATE'])
+    df['DAY'] = df['DATE'].dt.day
+    df['WEEK'] = df['DATE'].dt.isocalendar().week
+    df['MONTH'] = df['DATE'].dt.month
+    df['YEAR'] = df['DATE'].dt.year
+    return df
+
+
+def legacy_time_period_data(df, time_period):
+    """The original prepare_time_period_data grouping, kept as the baseline."""
+    if time_period == "Daily":
+        chart_data = df.copy()
+    elif time_period == "Weekly":
+        chart_data = df.groupby(['YEAR', 'WEEK', 'PRODUCT']).agg(
+            SENTIMENT_SCORE=('SENTIMENT_SCORE', 'mean'),
+            DATE=('DATE', 'first')
+        ).reset_index()
+        chart_data['WEEK_LABEL'] = chart_data.apply(lambda row: f"{row['YEAR']}-W{int(row['WEEK']):02d}", axis=1)
+    else:
+        chart_data = df.groupby(['YEAR', 'MONTH', 'PRODUCT']).agg(
+            SENTIMENT_SCORE=('SENTIMENT_SCORE', 'mean'),
+            DATE=('DATE', 'first')
+        ).reset_index()
+        chart_data['MONTH_LABEL'] = chart_data.apply(lambda row: f"{row['YEAR']}-{row['MONTH']:02d}", axis=1)
+    metrics = (chart_data['SENTIMENT_SCORE'].mean(),
+               chart_data['SENTIMENT_SCORE'].max(),
+               chart_data['SENTIMENT_SCORE'].min())
+    return chart_data, metrics
+
+
+def vectorized_time_period_data(df, time_period):
+    return prepare_time_period_data(df, time_period)
+
+
+def best_time(func, repeat):
+    """Best wall time of `repeat` calls of `func`, in seconds."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def report(rows, stage, legacy, vectorized):
+    note = " *" if stage == "Daily" else ""
+    print(f"{rows:>10} {stage:>8} {rows / legacy:>15,.0f} {rows / vectorized:>18,.0f} {legacy / vectorized:>7.1f}x{note}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 1_000_000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'rows':>10} {'stage':>8} {'legacy rows/s':>15} {'vectorized rows/s':>18} {'speedup':>8}")
+    for rows in args.rows:
+        raw = csv_reviews(rows)
+        report(rows, "Load",
+               best_time(lambda: legacy_prepare_reviews(raw.copy()), args.repeat),
+               best_time(lambda: prepare_reviews(raw.copy()), args.repeat))
+
+        legacy_df = legacy_prepare_reviews(raw.copy())
+        df = prepare_reviews(raw.copy())
+        for time_period in TIME_PERIODS:
+            report(rows, time_period,
+                   best_time(lambda: legacy_time_period_data(legacy_df, time_period), args.repeat),
+                   best_time(lambda: vectorized_time_period_data(df, time_period), args.repeat))
+
+    print("* The legacy Daily view copied every row into the chart; the new one aggregates per day and\n"
+          "  product, so it does more work here and sends far fewer rows to the chart.")
+
+
+if __name__ == "__main__":
+    main()
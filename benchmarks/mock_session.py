@@ -0,0 +1,176 @@
+"""
+Mock Snowpark session for the offline benchmarks.
+Answers the `session.sql(...)` statements the app issues (Cortex COMPLETE, EMBED_TEXT_768,
+SHOW/DESC CORTEX SEARCH SERVICES, SELECT 1 and the refreshes' review_changes check) with
+canned rows after an optional simulated round-trip delay, and offers a matching Cortex
+Search stand-in. Unknown statements raise, so a benchmark never silently measures nothing.
+
+Given synthetic reviews, `session.table(...)` serves them through `to_arrow_batches`, the
+path the review snapshot and the rollup load through (arrow_fetch.fetch_arrow).
+"""
+
+import re
+import time
+import zlib
+
+import numpy as np
+import pyarrow as pa
+from snowflake.snowpark import Row
+
+from synthetic import daily_cube
+
+# Rows per Arrow batch, about the size of a Snowflake result chunk
+ARROW_BATCH_ROWS = 100_000
+
+
+class MockQuery:
+    def __init__(self, rows, delay):
+        self.rows = rows
+        self.delay = delay
+
+    def collect(self):
+        if self.delay:
+            time.sleep(self.delay)
+        return self.rows
+
+
+class MockQueryHistory:
+    """Query history of a `with session.query_history()` block; the mock issues no query IDs."""
+
+    def __init__(self):
+        self.queries = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+class MockFrame:
+    """
+    Stand-in for the lazy Snowpark DataFrame `session.table(...)` returns.
+
+    Projections, filters and sorts are accepted but not evaluated: the frame serves every
+    review, or the day x product aggregates once it is grouped, as a cold-start refresh
+    fetches them. Batches carry the types Snowflake sends (strings, DATE as date32, FLOAT
+    as double), so the fetch pays for the same casts.
+    """
+
+    def __init__(self, session, name, grouped=False):
+        self.session = session
+        self.name = name
+        self.grouped = grouped
+
+    def _same(self, *args, **kwargs):
+        return self
+
+    select = filter = where = sort = with_column = with_columns = agg = _same
+
+    def group_by(self, *columns):
+        return MockFrame(self.session, self.name, grouped=True)
+
+    @property
+    def queries(self):
+        kind = "daily" if self.grouped else "rows"
+        return {"queries": [f"SELECT /* mock {kind} */ * FROM {self.name}"], "post_actions": []}
+
+    def to_arrow_batches(self):
+        self.session.queries.append(self.queries["queries"][-1])
+        if self.session.latency:
+            time.sleep(self.session.latency)
+        # Snowpark yields each result chunk as a pyarrow Table
+        table = self.session.arrow_table(self.grouped)
+        for offset in range(0, table.num_rows, ARROW_BATCH_ROWS):
+            yield table.slice(offset, ARROW_BATCH_ROWS)
+
+
+class MockSession:
+    """
+    Stand-in for a Snowpark session.
+
+    Args:
+        completion (str): Text returned by snowflake.cortex.complete.
+        latency (float): Simulated seconds per round trip.
+        services (list): Names of the Cortex Search services reported by SHOW.
+        reviews (pd.DataFrame): Reviews served by `table()`, e.g. synthetic.make_reviews().
+    """
+
+    def __init__(self, completion="A synthetic answer about winter gear.", latency=0.0,
+                 services=("REVIEW_SEARCH",), reviews=None):
+        self.completion = completion
+        self.latency = latency
+        self.services = list(services)
+        self.reviews = reviews
+        self.query_tag = None
+        self.queries = []
+        self._arrow_tables = {}
+
+    def query_history(self, include_thread_id=False):
+        return MockQueryHistory()
+
+    def table(self, name):
+        if self.reviews is None:
+            raise NotImplementedError(f"MockSession has no rows for table {name}")
+        return MockFrame(self, name)
+
+    def arrow_table(self, grouped=False):
+        """The reviews (or their day x product aggregates) as Snowflake would send them, built once."""
+        if grouped not in self._arrow_tables:
+            rows = daily_cube(self.reviews) if grouped else self.reviews
+            columns = {column: rows[column].to_numpy() for column in rows.columns}
+            columns["DATE"] = rows["DATE"].to_numpy().astype("datetime64[D]")
+            if grouped:
+                columns["SENTIMENT_SCORE"] = rows["SCORE_SUM"].to_numpy() / rows["REVIEW_COUNT"].to_numpy()
+            self._arrow_tables[grouped] = pa.table(columns)
+        return self._arrow_tables[grouped]
+
+    def get_current_database(self):
+        return "AVALANCHE_DB"
+
+    def get_current_schema(self):
+        return "AVALANCHE_SCHEMA"
+
+    def sql(self, query, params=None):
+        self.queries.append(query)
+        normalized = " ".join(query.lower().split())
+        if "cortex.complete" in normalized:
+            rows = [Row(self.completion)]
+        elif "cortex.embed_text_768" in normalized:
+            rows = [Row(embedding(params[1] if params else query))]
+        elif normalized.startswith("show cortex search services"):
+            rows = [Row(name=name, search_column="CHUNK") for name in self.services]
+        elif normalized.startswith("desc cortex search service"):
+            rows = [Row(search_column="CHUNK")]
+        elif "count_if(" in normalized and "scored_at" in normalized:
+            # queries.review_changes: a table that was never re-scored
+            rows = [Row(SCORED_AT=None, ROWS=0, SCORES=0, RESCORED=0)]
+        elif re.match(r"select 1\b", normalized):
+            rows = [Row(1)]
+        else:
+            raise NotImplementedError(f"MockSession does not answer: {query[:80]}")
+        return MockQuery(rows, self.latency)
+
+    def close(self):
+        pass
+
+
+def embedding(text, dimensions=768):
+    """Deterministic unit vector for `text`, standing in for EMBED_TEXT_768."""
+    rng = np.random.default_rng(zlib.crc32(text.encode("utf-8")))
+    vector = rng.normal(size=dimensions)
+    return (vector / np.linalg.norm(vector)).tolist()
+
+
+class MockSearchService:
+    """Cortex Search stand-in returning `limit` chunks drawn from a fixed corpus."""
+
+    def __init__(self, chunks, latency=0.0):
+        self.chunks = chunks
+        self.latency = latency
+
+    def search(self, query, limit):
+        if self.latency:
+            time.sleep(self.latency)
+        start = zlib.crc32(query.encode("utf-8")) % len(self.chunks)
+        return [self.chunks[(start + i) % len(self.chunks)] for i in range(limit)]
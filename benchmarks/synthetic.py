@@ -0,0 +1,83 @@
+"""
+Synthetic CUSTOMER_REVIEWS data for the offline benchmarks.
+Products and review texts come from assets/customer-reviews.md and each product's mean
+sentiment from data/customer_reviews.csv, so generated rows look like the real table at
+any size. Generation is vectorized; review texts are shared objects, so 10M rows fit in
+memory.
+"""
+
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "assets"))
+
+from records import read_records  # noqa: E402
+
+REVIEWS_SOURCE = os.path.join(ROOT, "assets", "customer-reviews.md")
+SCORES_SOURCE = os.path.join(ROOT, "data", "customer_reviews.csv")
+
+
+def review_texts(path=REVIEWS_SOURCE):
+    """Return {product: [review text, ...]} from the markdown source."""
+    texts = {}
+    for record in read_records(path, "review"):
+        texts.setdefault(record.get('Product Name'), []).append(record.get('Review').strip('"'))
+    return texts
+
+
+def make_reviews(rows, seed=0, start="2022-01-01", days=3 * 365):
+    """
+    Generate `rows` reviews with the CUSTOMER_REVIEWS columns.
+
+    Scores are drawn around each product's observed mean and dates lean towards the winter
+    months, like the real reviews.
+
+    Returns:
+        pd.DataFrame: PRODUCT, DATE (datetime64), SUMMARY and SENTIMENT_SCORE columns.
+    """
+    rng = np.random.default_rng(seed)
+    texts = review_texts()
+    products = sorted(texts)
+
+    observed = pd.read_csv(SCORES_SOURCE).groupby('PRODUCT')['SENTIMENT_SCORE'].mean()
+    means = np.array([observed.get(product, 0.0) for product in products])
+
+    product = rng.integers(0, len(products), rows)
+
+    # Pick one of the product's texts: flatten them and offset into each product's slice
+    flat = [text for p in products for text in texts[p]]
+    counts = np.array([len(texts[p]) for p in products])
+    offsets = np.concatenate([[0], np.cumsum(counts)[:-1]])
+    text = offsets[product] + (rng.random(rows) * counts[product]).astype(np.int64)
+
+    # Winter days are three times as likely as summer days
+    day = np.arange(days)
+    month = (pd.Timestamp(start) + pd.to_timedelta(day, unit='D')).month.to_numpy()
+    weights = np.where(np.isin(month, [11, 12, 1, 2, 3]), 3.0, 1.0)
+    date = rng.choice(day, rows, p=weights / weights.sum())
+
+    return pd.DataFrame({
+        'PRODUCT': np.array(products, dtype=object)[product],
+        'DATE': np.datetime64(start, 'D') + date.astype('timedelta64[D]'),
+        'SUMMARY': np.array(flat, dtype=object)[text],
+        'SENTIMENT_SCORE': np.clip(means[product] + rng.normal(0, 0.35, rows), -1, 1),
+    })
+
+
+def daily_cube(reviews):
+    """Aggregate reviews into the day x product rows `time_period_query("Daily")` returns."""
+    cube = (
+        reviews
+        .groupby(['DATE', 'PRODUCT'], sort=True, dropna=False)
+        .agg(REVIEW_COUNT=('SENTIMENT_SCORE', 'size'),
+             SCORE_SUM=('SENTIMENT_SCORE', 'sum'),
+             SCORE_MIN=('SENTIMENT_SCORE', 'min'),
+             SCORE_MAX=('SENTIMENT_SCORE', 'max'))
+        .reset_index()
+    )
+    cube['DATE'] = pd.to_datetime(cube['DATE'])
+    return cube
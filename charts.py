@@ -0,0 +1,217 @@
+"""
+Chart data preparation for the Avalanche dashboard.
+Charts are built from pre-aggregated rows that carry only the columns the encodings use,
+and series above the point budget are downsampled, so the Vega-Lite spec sent to the
+browser stays bounded no matter how many reviews the table holds.
+"""
+
+import altair as alt
+import numpy as np
+import pandas as pd
+
+# Maximum number of marks embedded in a chart spec
+CHART_POINT_BUDGET = 2000
+
+
+def lttb_indices(x, y, threshold):
+    """
+    Select `threshold` points of a series with Largest-Triangle-Three-Buckets.
+
+    The first and last points are always kept; every bucket in between keeps the point
+    forming the largest triangle with the previously kept point and the next bucket's mean,
+    which preserves peaks and troughs far better than taking every n-th point.
+
+    Returns:
+        np.ndarray: Sorted positions of the kept points.
+    """
+    n = len(x)
+    if threshold >= n:
+        return np.arange(n)
+    if threshold < 3:
+        # Too few points for triangles: keep the ends
+        return np.array([0, n - 1][:max(threshold, 0)], dtype=np.int64)
+
+    x = np.asarray(x, dtype='float64')
+    y = np.asarray(y, dtype='float64')
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+
+    kept = np.empty(threshold, dtype=np.int64)
+    kept[0], kept[-1] = 0, n - 1
+    previous = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        next_start, next_end = edges[i + 1], edges[i + 2] if i + 2 < len(edges) else n
+        next_x = x[next_start:next_end].mean()
+        next_y = y[next_start:next_end].mean()
+
+        area = np.abs(
+            (x[previous] - next_x) * (y[start:end] - y[previous])
+            - (x[previous] - x[start:end]) * (next_y - y[previous])
+        )
+        previous = start + int(np.argmax(area))
+        kept[i + 1] = previous
+    return kept
+
+
+def series_budgets(sizes, max_points):
+    """
+    Split `max_points` across series by length, at most the series length each and at most
+    `max_points` in total. Every series keeps 3 points when the budget allows it; with more
+    series than that, the longest series get what is left.
+    """
+    groups = len(sizes)
+    if max_points >= 3 * groups:
+        spare = max_points - 3 * groups
+        budgets = 3 + (sizes / sizes.sum() * spare).astype(int)
+    else:
+        budgets = pd.Series(0, index=sizes.index)
+        order = sizes.sort_values(ascending=False, kind='stable').index
+        share, extra = divmod(max_points, groups)
+        budgets[order] = share
+        budgets[order[:extra]] += 1
+    return np.minimum(budgets, sizes)
+
+
+def downsample_lttb(chart_data, max_points, x='DATE', y='SENTIMENT_SCORE', group='PRODUCT'):
+    """Downsample each `group` series with LTTB, sharing the point budget by series length."""
+    sizes = chart_data.groupby(group, observed=True).size()
+    budgets = series_budgets(sizes, max_points)
+
+    parts = []
+    for name, series in chart_data.groupby(group, observed=True, sort=False):
+        series = series.sort_values(x)
+        positions = series[x].to_numpy(dtype='datetime64[ns]').astype(np.int64)
+        parts.append(series.iloc[lttb_indices(positions, series[y].to_numpy(), budgets[name])])
+    return pd.concat(parts).sort_values([x, group], ignore_index=True)
+
+
+def downsample_buckets(chart_data, max_points, x='DATE', group='PRODUCT'):
+    """
+    Merge rows into equal-width time buckets until the chart fits the point budget.
+    Means are recombined from REVIEW_COUNT and SCORE_SUM, so the result is exact per bucket.
+    """
+    products = chart_data[group].nunique()
+    buckets = max(max_points // max(products, 1), 1)
+    days = chart_data[x].to_numpy(dtype='datetime64[D]').astype(np.int64)
+    span = days.max() - days.min() + 1
+    bucket = (days - days.min()) * buckets // span
+
+    # Label columns (WEEK_LABEL, MONTH_LABEL) take the value of each bucket's first period
+    labels = [column for column in chart_data.columns if column.endswith('_LABEL')]
+    bucketed = (
+        chart_data
+        .assign(_BUCKET=bucket)
+        .sort_values(x, kind='stable')
+        .groupby(['_BUCKET', group], observed=True)
+        .agg(**{x: (x, 'min'),
+                'REVIEW_COUNT': ('REVIEW_COUNT', 'sum'),
+                'SCORE_SUM': ('SCORE_SUM', 'sum')},
+             **{label: (label, 'first') for label in labels})
+        .reset_index()
+        .drop(columns='_BUCKET')
+    )
+    bucketed['SENTIMENT_SCORE'] = bucketed['SCORE_SUM'] / bucketed['REVIEW_COUNT']
+    return bucketed.sort_values([x, group], ignore_index=True)
+
+
+def prepare_chart_data(chart_data, columns, max_points=CHART_POINT_BUDGET, method="lttb"):
+    """
+    Keep only the `columns` the chart encodes and downsample above the point budget.
+
+    Only charts with a temporal DATE axis (the dense Daily series) are downsampled; the
+    Weekly and Monthly charts plot one mark per period label on a nominal axis, and
+    dropping rows would drop weeks and months from that axis.
+
+    Args:
+        chart_data (pd.DataFrame): Pre-aggregated chart rows.
+        columns (list): Columns referenced by the chart encodings.
+        max_points (int): Maximum number of rows embedded in the chart spec.
+        method (str): "lttb" to keep representative rows per product, for line charts, or
+            "bucket" to merge rows into coarser time buckets, for bar charts.
+
+    Returns:
+        pd.DataFrame: At most about `max_points` rows holding only `columns`.
+    """
+    if len(chart_data) > max_points and 'DATE' in columns:
+        if method == "bucket":
+            chart_data = downsample_buckets(chart_data, max_points)
+        else:
+            chart_data = downsample_lttb(chart_data, max_points)
+    return chart_data[columns]
+
+
+def encoded_columns(*encodings):
+    """Return the field names referenced by Altair encodings or shorthand strings."""
+    columns = []
+    for encoding in encodings:
+        for item in encoding if isinstance(encoding, list) else [encoding]:
+            shorthand = item if isinstance(item, str) else item.to_dict().get('field')
+            field = shorthand.split(':')[0] if shorthand else None
+            if field and field not in columns:
+                columns.append(field)
+    return columns
+
+
+def sentiment_chart(chart_data, x_encoding, tooltip_encoding, max_points=CHART_POINT_BUDGET):
+    """
+    Build the period sentiment bar chart from pre-aggregated, downsampled rows.
+    Bars are merged into time buckets rather than dropped, so every day is still counted.
+    """
+    columns = encoded_columns(x_encoding, 'SENTIMENT_SCORE', tooltip_encoding)
+    chart_data = prepare_chart_data(chart_data, columns, max_points, method="bucket")
+    return alt.Chart(chart_data).mark_bar(size=15).encode(
+        x=x_encoding,
+        y=alt.Y('SENTIMENT_SCORE:Q'),
+        color=alt.condition(
+            alt.datum.SENTIMENT_SCORE >= 0,
+            alt.value('#2ecc71'),  # green for positive
+            alt.value('#e74c3c')   # red for negative
+        ),
+        tooltip=tooltip_encoding
+    ).properties(
+        height=400
+    )
+
+
+def product_bar_chart(product_data):
+    """Build the product sentiment bar chart from per-product means."""
+    return alt.Chart(product_data[['PRODUCT', 'SENTIMENT_SCORE', 'REVIEW_COUNT']]).mark_bar(size=15).encode(
+        y=alt.Y('PRODUCT:N',
+                axis=alt.Axis(
+                    labelAngle=0,  # Horizontal labels
+                    labelOverlap=False,  # Prevent label overlap
+                    labelPadding=10  # Add some padding
+                )
+        ),
+        x=alt.X('SENTIMENT_SCORE:Q',  # Mean sentiment score from the rollup
+                title='MEAN SENTIMENT_SCORE'),
+        color=alt.condition(
+            alt.datum.SENTIMENT_SCORE >= 0,
+            alt.value('#2ecc71'),  # green for positive
+            alt.value('#e74c3c')   # red for negative
+        ),
+        tooltip=['PRODUCT:N', alt.Tooltip('SENTIMENT_SCORE:Q', title='MEAN SENTIMENT_SCORE'), 'REVIEW_COUNT:Q']
+    ).properties(
+        height=400
+    )
+
+
+def product_trend_chart(chart_data, x_encoding, tooltip_encoding, max_points=CHART_POINT_BUDGET):
+    """Build per-product sentiment lines above per-product review count bars, sharing the x axis."""
+    columns = encoded_columns(x_encoding, 'SENTIMENT_SCORE', 'PRODUCT', 'REVIEW_COUNT', tooltip_encoding)
+    base = alt.Chart(prepare_chart_data(chart_data, columns, max_points)).encode(
+        x=x_encoding,
+        color=alt.Color('PRODUCT:N'),
+        tooltip=tooltip_encoding
+    )
+    lines = base.mark_line(point=True).encode(
+        y=alt.Y('SENTIMENT_SCORE:Q')
+    ).properties(
+        height=300
+    )
+    counts = base.mark_bar().encode(
+        y=alt.Y('REVIEW_COUNT:Q', title='REVIEWS')
+    ).properties(
+        height=120
+    )
+    return alt.vconcat(lines, counts)
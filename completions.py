@@ -0,0 +1,88 @@
+"""
+Completion backends for the chatbot.
+Every backend offers a blocking `complete` and a token-streaming `stream`, so the app can
+render the answer as it is generated. The fake backend replays canned text offline for
+local development and tests.
+"""
+
+import os
+import time
+
+from snowflake.cortex import complete as cortex_complete
+
+# Backend used when AVALANCHE_COMPLETION_BACKEND is not set
+DEFAULT_BACKEND = "cortex"
+
+
+class CortexBackend:
+    """Cortex COMPLETE through SQL for blocking calls and the Cortex REST API for streaming."""
+
+    def __init__(self, session):
+        self.session = session
+
+    def complete(self, model, prompt):
+        return self.session.sql("SELECT snowflake.cortex.complete(?,?)", (model, prompt)).collect()[0][0]
+
+    def stream(self, model, prompt):
+        return cortex_complete(model, prompt, session=self.session, stream=True)
+
+
+class FakeBackend:
+    """Offline backend that streams a canned response in fixed-size chunks."""
+
+    def __init__(self, session=None, response=None, chunk_size=8, first_token_delay=0.2, chunk_delay=0.02):
+        self.response = response or (
+            "This is a canned answer from the local completion backend. "
+            "Set AVALANCHE_COMPLETION_BACKEND=cortex to query Snowflake Cortex."
+        )
+        self.chunk_size = chunk_size
+        self.first_token_delay = first_token_delay
+        self.chunk_delay = chunk_delay
+
+    def complete(self, model, prompt):
+        return "".join(self.stream(model, prompt))
+
+    def stream(self, model, prompt):
+        time.sleep(self.first_token_delay)
+        for start in range(0, len(self.response), self.chunk_size):
+            if start:
+                time.sleep(self.chunk_delay)
+            yield self.response[start:start + self.chunk_size]
+
+
+BACKENDS = {
+    "cortex": CortexBackend,
+    "fake": FakeBackend,
+}
+
+
+def get_backend(session, name=None):
+    """Create the completion backend named by `name` or the AVALANCHE_COMPLETION_BACKEND variable."""
+    name = name or os.environ.get("AVALANCHE_COMPLETION_BACKEND", DEFAULT_BACKEND)
+    return BACKENDS[name](session)
+
+
+class TimedStream:
+    """
+    Iterate over a token stream while measuring time to first token and total latency.
+
+    Both timings are measured from `started`, which defaults to the creation of the
+    TimedStream; pass the time the question was submitted to include retrieval as well.
+    """
+
+    def __init__(self, chunks, started=None):
+        self.chunks = chunks
+        self.started = started if started is not None else time.perf_counter()
+        self.time_to_first_token = None
+        self.total_time = None
+        self.text = ""
+
+    def __iter__(self):
+        parts = []
+        for chunk in self.chunks:
+            if self.time_to_first_token is None:
+                self.time_to_first_token = time.perf_counter() - self.started
+            parts.append(chunk)
+            yield chunk
+        self.text = "".join(parts)
+        self.total_time = time.perf_counter() - self.started
@@ -0,0 +1,106 @@
+"""
+Token-budgeted context assembly for the RAG chatbot.
+Retrieved chunks are deduplicated and packed in rank order into a per-model token budget,
+so the answer prompt, and with it completion latency and cost, stays bounded however many
+chunks are retrieved.
+"""
+
+import math
+import re
+
+from rag_pipeline import format_context
+
+# Approximate characters per token of each model's tokenizer on English text
+# (SNOWFLAKE.CORTEX.COUNT_TOKENS gives exact counts when calibrating these)
+CHARS_PER_TOKEN = {
+    "mistral-large": 3.6,
+    "claude-3-5-sonnet": 3.8,
+    "llama3-8b": 4.2,
+}
+DEFAULT_CHARS_PER_TOKEN = 3.5
+
+# Tokens of retrieved context allowed in the answer prompt of each model; well below the
+# context windows, leaving room for the instructions, chat history and the answer
+CONTEXT_TOKEN_BUDGETS = {
+    "mistral-large": 6000,
+    "claude-3-5-sonnet": 8000,
+    "llama3-8b": 3000,
+}
+DEFAULT_CONTEXT_TOKEN_BUDGET = 3000
+
+# Word-shingle Jaccard similarity above which two chunks count as duplicates
+DUPLICATE_SIMILARITY = 0.85
+
+
+def estimate_tokens(text, model):
+    """Estimate the number of tokens `model` needs for `text`."""
+    return math.ceil(len(text) / CHARS_PER_TOKEN.get(model, DEFAULT_CHARS_PER_TOKEN))
+
+
+def shingles(text, size=3):
+    words = re.findall(r"\w+", text.lower())
+    if len(words) < size:
+        return {" ".join(words)}
+    return {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+def is_near_duplicate(candidate, kept, threshold=DUPLICATE_SIMILARITY):
+    for other in kept:
+        union = len(candidate | other)
+        if union and len(candidate & other) / union >= threshold:
+            return True
+    return False
+
+
+class ContextAssembly:
+    """Chunks chosen for the prompt, with the token accounting behind the choice."""
+
+    def __init__(self, documents, tokens_used, budget, duplicates, over_budget):
+        self.documents = documents
+        self.tokens_used = tokens_used
+        self.budget = budget
+        self.duplicates = duplicates
+        self.over_budget = over_budget
+
+    @property
+    def context(self):
+        return format_context(self.documents)
+
+
+def assemble_context(documents, model, budget=None, threshold=DUPLICATE_SIMILARITY):
+    """
+    Pack ranked chunks into the model's context token budget.
+
+    Chunks are visited in rank order; near-duplicates of an already kept chunk are dropped,
+    and chunks that no longer fit the remaining budget are skipped so that smaller,
+    lower-ranked chunks can still fill it.
+
+    Args:
+        documents (list): Chunk texts, best match first.
+        model (str): Model the prompt is for.
+        budget (int): Token budget; defaults to the model's CONTEXT_TOKEN_BUDGETS entry.
+        threshold (float): Shingle similarity above which a chunk is a duplicate.
+
+    Returns:
+        ContextAssembly: The kept chunks in rank order and the token accounting.
+    """
+    if budget is None:
+        budget = CONTEXT_TOKEN_BUDGETS.get(model, DEFAULT_CONTEXT_TOKEN_BUDGET)
+
+    kept, kept_shingles = [], []
+    tokens_used, duplicates, over_budget = 0, 0, 0
+    for document in documents:
+        document_shingles = shingles(document)
+        if is_near_duplicate(document_shingles, kept_shingles, threshold):
+            duplicates += 1
+            continue
+        # Count the chunk as it appears in the prompt, numbering included
+        tokens = estimate_tokens(format_context([document]), model)
+        if tokens_used + tokens > budget:
+            over_budget += 1
+            continue
+        kept.append(document)
+        kept_shingles.append(document_shingles)
+        tokens_used += tokens
+
+    return ContextAssembly(kept, tokens_used, budget, duplicates, over_budget)
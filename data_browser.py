@@ -0,0 +1,80 @@
+"""
+Paged browsing of the review snapshot for the Data tab.
+Filtering, sorting and paging run on the cached Arrow table, and only the rows of the
+visible page are converted to pandas and sent to the browser.
+"""
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+SORTABLE_COLUMNS = ["DATE", "PRODUCT", "SENTIMENT_SCORE"]
+PAGE_SIZES = [25, 50, 100, 250]
+
+
+def filter_reviews(table, products=None, date_range=None, score_range=None):
+    """
+    Filter the review table by product, date range and sentiment range.
+
+    Args:
+        table (pa.Table): Review snapshot as an Arrow table.
+        products (list): Keep only these products; all products when empty.
+        date_range (tuple): Inclusive (start, end) dates.
+        score_range (tuple): Inclusive (low, high) SENTIMENT_SCORE bounds.
+
+    Returns:
+        pa.Table: The matching rows.
+    """
+    mask = None
+
+    def combine(condition):
+        return condition if mask is None else pc.and_(mask, condition)
+
+    if products:
+        product_type = table.schema.field('PRODUCT').type
+        if pa.types.is_dictionary(product_type):
+            product_type = product_type.value_type
+        mask = combine(pc.is_in(table['PRODUCT'], value_set=pa.array(products, type=product_type)))
+    if date_range:
+        dates = table['DATE']
+        start, end = (pa.scalar(pd.Timestamp(value), type=dates.type) for value in date_range)
+        mask = combine(pc.and_(pc.greater_equal(dates, start), pc.less_equal(dates, end)))
+    if score_range:
+        scores = table['SENTIMENT_SCORE']
+        mask = combine(pc.and_(pc.greater_equal(scores, score_range[0]), pc.less_equal(scores, score_range[1])))
+
+    return table if mask is None else table.filter(mask)
+
+
+def review_page(table, page, page_size, sort_by="DATE", descending=False):
+    """
+    Return one page of sorted reviews.
+
+    Only the sort column is sorted; the page's rows are then taken from the table, so the
+    cost of materializing the result is bounded by `page_size`.
+
+    Args:
+        table (pa.Table): Reviews, usually the output of `filter_reviews`.
+        page (int): 1-based page number.
+        page_size (int): Rows per page.
+        sort_by (str): Column to sort by.
+        descending (bool): Sort in descending order.
+
+    Returns:
+        pd.DataFrame: The rows of the page.
+    """
+    order = "descending" if descending else "ascending"
+    keys = table.select([sort_by])
+    # Arrow cannot sort dictionary (categorical) columns directly; sort their values
+    sort_type = keys.schema.field(sort_by).type
+    if pa.types.is_dictionary(sort_type):
+        keys = keys.cast(pa.schema([(sort_by, sort_type.value_type)]))
+    indices = pc.sort_indices(keys, sort_keys=[(sort_by, order)])
+
+    offset = (page - 1) * page_size
+    return table.take(indices.slice(offset, page_size)).to_pandas()
+
+
+def page_count(total_rows, page_size):
+    """Number of pages needed to show `total_rows` (at least one)."""
+    return max((total_rows + page_size - 1) // page_size, 1)
@@ -0,0 +1,235 @@
+"""
+Latency-aware model routing for the chatbot.
+The chat-history rewrite goes to a small, fast model while the answer goes to the selected
+model. Rolling latency statistics are kept per model in-process: a model whose p95 exceeds
+the latency budget is routed around, a model that fails falls back to the next one, and a
+call that outlives the budget is hedged by starting the next model and taking whichever
+answers first. Prompts can be built per model, so a fallback or hedge gets a prompt packed
+for its own context budget.
+"""
+
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import numpy as np
+
+# Model for the chat-history rewrite, which only needs a short query back
+REWRITE_MODEL = "llama3-8b"
+
+# Seconds allowed for the rewrite, and until the answer's first token
+REWRITE_LATENCY_BUDGET = 1.5
+ANSWER_LATENCY_BUDGET = 3.0
+
+# Latencies kept per model, and samples needed before a model's p95 is trusted
+LATENCY_WINDOW = 50
+MIN_SAMPLES = 5
+
+EXECUTOR = ThreadPoolExecutor(max_workers=16, thread_name_prefix="router")
+
+
+class LatencyStats:
+    """Rolling window of call latencies per model."""
+
+    def __init__(self, window=LATENCY_WINDOW):
+        self.window = window
+        self._latencies = {}
+        self._lock = threading.Lock()
+
+    def record(self, model, seconds):
+        with self._lock:
+            self._latencies.setdefault(model, deque(maxlen=self.window)).append(seconds)
+
+    def samples(self, model):
+        with self._lock:
+            return list(self._latencies.get(model, ()))
+
+    def percentile(self, model, q=95, min_samples=MIN_SAMPLES):
+        """The q-th percentile latency of `model`, or None with too few samples."""
+        samples = self.samples(model)
+        if len(samples) < min_samples:
+            return None
+        return float(np.percentile(samples, q))
+
+    def summary(self):
+        """{model: (samples, p50, p95)} for every model seen so far."""
+        with self._lock:
+            models = list(self._latencies)
+        return {
+            model: (len(self.samples(model)),
+                    self.percentile(model, 50, min_samples=1),
+                    self.percentile(model, 95, min_samples=1))
+            for model in models
+        }
+
+
+def candidates(models, preferred, stats, budget):
+    """
+    Order models for a call: `preferred` first unless its p95 is over budget.
+
+    Models over budget move behind the ones within budget (or without enough samples yet),
+    fastest first, so fallbacks and hedges go to the most promising model.
+    """
+    ordered = [preferred] + [m for m in models if m != preferred]
+
+    def over_budget(model):
+        p95 = stats.percentile(model)
+        return p95 is not None and p95 > budget
+
+    within = [m for m in ordered if not over_budget(m)]
+    over = sorted((m for m in ordered if over_budget(m)), key=stats.percentile)
+    return within + over
+
+
+def prompt_for(prompt, model):
+    """The prompt for `model`: `prompt` itself, or prompt(model) when it is a builder."""
+    return prompt(model) if callable(prompt) else prompt
+
+
+def close_stream(result):
+    """Close the chunk iterator of a losing `first_chunk` result, ending its stream."""
+    _, chunks = result
+    close = getattr(chunks, "close", None)
+    if close is not None:
+        close()
+
+
+def race(calls, budget, hedge=True, discard=None):
+    """
+    Run `calls` in priority order until one succeeds.
+
+    The next call starts as soon as every running call has failed, or, with `hedge`,
+    whenever `budget` seconds pass without a result. The first successful result wins;
+    the other calls finish in the background.
+
+    Args:
+        calls (list): Zero-argument callables, best first.
+        budget (float): Seconds to wait before hedging with the next call.
+        hedge (bool): Start the next call when the budget runs out.
+        discard (callable): Called with the result of every other call that succeeds,
+            once it finishes, e.g. to close a losing stream.
+
+    Returns:
+        tuple: (index of the winning call, its result).
+    """
+    pending = iter(enumerate(calls))
+    running = {}
+    error = None
+
+    def discard_result(future):
+        if future.exception() is None:
+            discard(future.result())
+
+    def start_next():
+        item = next(pending, None)
+        if item is not None:
+            running[EXECUTOR.submit(item[1])] = item[0]
+
+    start_next()
+    while running:
+        done, _ = wait(running, timeout=budget, return_when=FIRST_COMPLETED)
+        if not done:
+            if hedge:
+                start_next()
+            continue
+        for future in done:
+            index = running.pop(future)
+            if future.exception() is None:
+                if discard is not None:
+                    for loser in running:
+                        loser.add_done_callback(discard_result)
+                return index, future.result()
+            error = future.exception()
+        if not running:
+            # Every running call failed; fall back to the next model right away
+            start_next()
+    raise error
+
+
+def timed_call(stats, model, budget, func, *args):
+    """Call func(*args), recording its latency; failures count as at least `budget`."""
+    start = time.perf_counter()
+    try:
+        result = func(*args)
+    except Exception:
+        # Count failures as slow calls, so failing models are routed around
+        stats.record(model, max(time.perf_counter() - start, budget))
+        raise
+    stats.record(model, time.perf_counter() - start)
+    return result
+
+
+class ModelRouter:
+    """Routes the rewrite and answer calls of the chatbot across `models`."""
+
+    def __init__(self, models, rewrite_model=REWRITE_MODEL):
+        self.models = models
+        self.rewrite_model = rewrite_model
+        self.completion_stats = LatencyStats()
+        self.first_token_stats = LatencyStats()
+
+    def complete(self, complete, prompt, preferred=None, budget=REWRITE_LATENCY_BUDGET, hedge=True,
+                 cached=None):
+        """
+        Blocking completion routed by total latency; the rewrite model is preferred.
+
+        Args:
+            complete (callable): complete(model, prompt) -> text.
+            prompt (str or callable): The prompt, or prompt(model) -> prompt for that model.
+            preferred (str): Model to try first; defaults to the rewrite model.
+            budget (float): Latency budget in seconds.
+            hedge (bool): Hedge calls that outlive the budget.
+            cached (callable): cached(model, prompt) -> text or None. A cached text is
+                returned without calling the model, and its latency is not recorded.
+
+        Returns:
+            tuple: (text, model that produced it).
+        """
+        models = candidates(self.models, preferred or self.rewrite_model, self.completion_stats, budget)
+
+        def attempt(model):
+            model_prompt = prompt_for(prompt, model)
+            text = cached(model, model_prompt) if cached is not None else None
+            if text is None:
+                text = timed_call(self.completion_stats, model, budget, complete, model, model_prompt)
+            return text
+
+        def call(model):
+            return lambda: attempt(model)
+
+        index, text = race([call(model) for model in models], budget, hedge)
+        return text, models[index]
+
+    def stream(self, stream, prompt, preferred, budget=ANSWER_LATENCY_BUDGET, hedge=True):
+        """
+        Token stream routed by time to first token; `preferred` is the selected model.
+
+        Args:
+            stream (callable): stream(model, prompt) -> iterator of text chunks.
+            prompt (str or callable): The prompt, or prompt(model) -> prompt for that model.
+            preferred (str): Model selected by the user.
+            budget (float): Time-to-first-token budget in seconds.
+            hedge (bool): Hedge streams whose first token outlives the budget.
+
+        Returns:
+            tuple: (iterator of text chunks, model that produced them).
+        """
+        models = candidates(self.models, preferred, self.first_token_stats, budget)
+
+        def first_chunk(model, model_prompt):
+            chunks = iter(stream(model, model_prompt))
+            return next(chunks, ""), chunks
+
+        def call(model):
+            return lambda: timed_call(self.first_token_stats, model, budget, first_chunk, model,
+                                      prompt_for(prompt, model))
+
+        # Streams that lose the race are closed instead of being read to the end
+        index, (first, chunks) = race([call(model) for model in models], budget, hedge, discard=close_stream)
+
+        def chained():
+            yield first
+            yield from chunks
+
+        return chained(), models[index]
@@ -0,0 +1,178 @@
+"""
+Incremental PARSE_DOCUMENT ingestion for the customer_reviews stage.
+Staged files are compared with the PARSED_DOCUMENTS table through the stage's directory
+table (MD5, falling back to LAST_MODIFIED), and only new or changed files are parsed. Each
+batch of files is parsed and MERGEd by a single statement, with a bounded number of
+batches running at once, so re-running the job never re-parses the whole stage.
+
+Usage: python parse_documents.py [--batch-size N] [--workers N] [--mode layout|ocr]
+"""
+
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+STAGE = "@AVALANCHE_DB.AVALANCHE_SCHEMA.CUSTOMER_REVIEWS"
+PARSED_DOCUMENTS_TABLE = "AVALANCHE_DB.AVALANCHE_SCHEMA.PARSED_DOCUMENTS"
+
+# File types PARSE_DOCUMENT is run on
+SUPPORTED_EXTENSIONS = ["pdf", "docx"]
+
+# Files parsed per MERGE statement, and MERGE statements running at once
+BATCH_SIZE = 10
+MAX_PARSE_WORKERS = 4
+
+
+def ensure_parsed_documents_table(session, table=PARSED_DOCUMENTS_TABLE):
+    session.sql(f"""
+        CREATE TABLE IF NOT EXISTS {table} (
+            RELATIVE_PATH STRING PRIMARY KEY,
+            FILE_URL STRING,
+            MD5 STRING,
+            LAST_MODIFIED TIMESTAMP_TZ,
+            SIZE NUMBER,
+            CONTENT STRING,
+            PARSED_AT TIMESTAMP_LTZ
+        )
+    """).collect()
+
+
+def changed_files(session, stage=STAGE, table=PARSED_DOCUMENTS_TABLE):
+    """
+    List the staged files that are not parsed yet or changed since they were parsed.
+
+    Returns:
+        list: RELATIVE_PATH of every new or changed file, in path order.
+    """
+    extensions = ", ".join(f"'{extension}'" for extension in SUPPORTED_EXTENSIONS)
+    rows = session.sql(f"""
+        SELECT d.RELATIVE_PATH
+        FROM DIRECTORY({stage}) d
+        LEFT JOIN {table} p ON p.RELATIVE_PATH = d.RELATIVE_PATH
+        WHERE LOWER(SPLIT_PART(d.RELATIVE_PATH, '.', -1)) IN ({extensions})
+          AND (p.RELATIVE_PATH IS NULL
+               OR p.MD5 IS DISTINCT FROM d.MD5
+               OR (d.MD5 IS NULL AND p.LAST_MODIFIED IS DISTINCT FROM d.LAST_MODIFIED))
+        ORDER BY d.RELATIVE_PATH
+    """).collect()
+    return [row["RELATIVE_PATH"] for row in rows]
+
+
+def merge_parsed_batch(session, paths, stage=STAGE, table=PARSED_DOCUMENTS_TABLE, mode="layout"):
+    """Parse `paths` with PARSE_DOCUMENT and MERGE the results, in one statement."""
+    placeholders = ", ".join("?" for _ in paths)
+    session.sql(f"""
+        MERGE INTO {table} t
+        USING (
+            SELECT
+                RELATIVE_PATH,
+                FILE_URL,
+                MD5,
+                LAST_MODIFIED,
+                SIZE,
+                SNOWFLAKE.CORTEX.PARSE_DOCUMENT(
+                    {stage},
+                    RELATIVE_PATH,
+                    {{'mode': '{mode}'}}
+                ):content::STRING AS CONTENT
+            FROM DIRECTORY({stage})
+            WHERE RELATIVE_PATH IN ({placeholders})
+        ) s
+        ON t.RELATIVE_PATH = s.RELATIVE_PATH
+        WHEN MATCHED THEN UPDATE SET
+            FILE_URL = s.FILE_URL,
+            MD5 = s.MD5,
+            LAST_MODIFIED = s.LAST_MODIFIED,
+            SIZE = s.SIZE,
+            CONTENT = s.CONTENT,
+            PARSED_AT = CURRENT_TIMESTAMP()
+        WHEN NOT MATCHED THEN INSERT
+            (RELATIVE_PATH, FILE_URL, MD5, LAST_MODIFIED, SIZE, CONTENT, PARSED_AT)
+            VALUES (s.RELATIVE_PATH, s.FILE_URL, s.MD5, s.LAST_MODIFIED, s.SIZE, s.CONTENT, CURRENT_TIMESTAMP())
+    """, params=list(paths)).collect()
+
+
+def run_batches(paths, merge, batch_size, max_workers):
+    """
+    Split `paths` into batches and run `merge(batch)` on up to `max_workers` at once.
+    A failing batch is reported and left for the next run; the other batches still land.
+
+    Returns:
+        tuple: Paths of the batches that succeeded, and (paths, error message) pairs of
+        the batches that failed.
+    """
+    batches = [paths[i:i + batch_size] for i in range(0, len(paths), batch_size)]
+
+    def run(batch):
+        try:
+            merge(batch)
+            return batch, None
+        except Exception as e:
+            return batch, str(e)
+
+    done, failed = [], []
+    if batches:
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(batches))) as executor:
+            for batch, error in executor.map(run, batches):
+                if error is None:
+                    done.extend(batch)
+                else:
+                    failed.append((batch, error))
+    return done, failed
+
+
+def remove_deleted(session, stage=STAGE, table=PARSED_DOCUMENTS_TABLE):
+    """Delete parsed documents whose file is no longer on the stage; returns the row count."""
+    return session.sql(f"""
+        DELETE FROM {table}
+        WHERE RELATIVE_PATH NOT IN (SELECT RELATIVE_PATH FROM DIRECTORY({stage}))
+    """).collect()[0][0]
+
+
+def ingest(session, stage=STAGE, table=PARSED_DOCUMENTS_TABLE, batch_size=BATCH_SIZE,
+           max_workers=MAX_PARSE_WORKERS, mode="layout"):
+    """
+    Parse the new and changed files of `stage` into `table`.
+
+    The directory table is refreshed first, so files PUT since the last refresh are seen.
+    Batches run through `run_batches`, so a failing batch does not stop the others.
+
+    Args:
+        session: Snowpark session.
+        stage (str): Stage holding the documents, as "@db.schema.stage".
+        table (str): Parsed documents table.
+        batch_size (int): Files parsed per MERGE statement.
+        max_workers (int): Maximum number of MERGE statements running at once.
+        mode (str): PARSE_DOCUMENT mode, "layout" or "ocr".
+
+    Returns:
+        dict: "parsed" paths, "failed" (paths, error message) pairs and "removed" row count.
+    """
+    ensure_parsed_documents_table(session, table)
+    session.sql(f"ALTER STAGE {stage.lstrip('@')} REFRESH").collect()
+
+    parsed, failed = run_batches(
+        changed_files(session, stage, table),
+        lambda batch: merge_parsed_batch(session, batch, stage, table, mode),
+        batch_size, max_workers,
+    )
+
+    return {"parsed": parsed, "failed": failed, "removed": remove_deleted(session, stage, table)}
+
+
+if __name__ == "__main__":
+    from snowflake.snowpark import Session
+
+    parser = argparse.ArgumentParser(description="Parse new and changed staged documents.")
+    parser.add_argument("--stage", default=STAGE)
+    parser.add_argument("--table", default=PARSED_DOCUMENTS_TABLE)
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--workers", type=int, default=MAX_PARSE_WORKERS)
+    parser.add_argument("--mode", choices=["layout", "ocr"], default="layout")
+    args = parser.parse_args()
+
+    result = ingest(Session.builder.getOrCreate(), args.stage, args.table,
+                    args.batch_size, args.workers, args.mode)
+    for batch, error in result["failed"]:
+        print(f"Error parsing {', '.join(batch)}: {error}")
+    print(f"Parsed {len(result['parsed'])} files, {sum(len(b) for b, _ in result['failed'])} failed, "
+          f"removed {result['removed']} deleted files")
@@ -0,0 +1,166 @@
+"""
+Query builders for the Avalanche dashboard.
+Each function returns a lazy Snowpark DataFrame so the aggregation runs in Snowflake
+and only the aggregated or projected rows are fetched (see arrow_fetch.py).
+"""
+
+from snowflake.snowpark import functions as F
+from snowflake.snowpark.exceptions import SnowparkSQLException
+
+REVIEWS_TABLE = "AVALANCHE_DB.AVALANCHE_SCHEMA.CUSTOMER_REVIEWS"
+
+# Columns the Data tab browses; the review text is only fetched when it is shown
+REVIEW_COLUMNS = ["PRODUCT", "DATE", "SENTIMENT_SCORE"]
+TEXT_COLUMNS = ["SUMMARY"]
+
+# DATE_TRUNC part used for each option of the "Select time period" selectbox
+TIME_PERIOD_PARTS = {
+    "Daily": "DAY",
+    "Weekly": "WEEK",
+    "Monthly": "MONTH",
+}
+
+
+def reviews(session, table=REVIEWS_TABLE, columns=None):
+    """
+    Return the customer reviews table with DATE and SENTIMENT_SCORE typed.
+
+    Args:
+        session: Snowpark session.
+        table (str): Fully qualified customer reviews table.
+        columns (list): Columns to select; all columns when None.
+    """
+    typed = {
+        "DATE": F.to_date(F.col("DATE")),
+        "SENTIMENT_SCORE": F.col("SENTIMENT_SCORE").cast("FLOAT"),
+    }
+    rows = session.table(table)
+    if columns is None:
+        return rows.with_columns(list(typed), list(typed.values()))
+    return rows.select([typed[column].alias(column) if column in typed else F.col(column) for column in columns])
+
+
+def period_label(period, time_period):
+    """Build the WEEK_LABEL / MONTH_LABEL column expression for a truncated date."""
+    if time_period == "Weekly":
+        return F.concat(
+            F.call_function("YEAROFWEEKISO", period).cast("STRING"),
+            F.lit("-W"),
+            F.lpad(F.call_function("WEEKISO", period).cast("STRING"), 2, F.lit("0")),
+        )
+    return F.to_char(period, "YYYY-MM")
+
+
+def time_period_query(session, time_period, since=None, table=REVIEWS_TABLE, products=None, until=None,
+                      undated=False):
+    """
+    Aggregate SENTIMENT_SCORE per product for the selected time period.
+
+    The filters are applied before the aggregation, as `PRODUCT IN (...)` and
+    `DATE BETWEEN ...` predicates, so Snowflake prunes micro-partitions on the table's
+    clustering keys instead of scanning every review.
+
+    Args:
+        session: Snowpark session.
+        time_period (str): One of "Daily", "Weekly" or "Monthly".
+        since (datetime.date): Only aggregate reviews on or after this date.
+        table (str): Fully qualified customer reviews table.
+        products (list): Only aggregate these products; all products when empty.
+        until (datetime.date): Only aggregate reviews on or before this date.
+        undated (bool): With `since` alone, also aggregate the reviews without a DATE.
+
+    Returns:
+        snowflake.snowpark.DataFrame: One row per period and product with DATE (start of the
+        period), PRODUCT, SENTIMENT_SCORE (mean), REVIEW_COUNT, SCORE_SUM, SCORE_MIN and
+        SCORE_MAX, plus WEEK_LABEL or MONTH_LABEL. The count, sum, min and max can be
+        combined across rows, so finer periods roll up into coarser ones without rescanning.
+    """
+    part = TIME_PERIOD_PARTS[time_period]
+    period = F.date_trunc(part, F.col("DATE"))
+
+    rows = reviews(session, table, REVIEW_COLUMNS)
+    if products:
+        rows = rows.filter(F.col("PRODUCT").isin(list(products)))
+    if since is not None and until is not None:
+        rows = rows.filter(F.col("DATE").between(F.lit(since), F.lit(until)))
+    elif since is not None:
+        after = F.col("DATE") >= F.lit(since)
+        rows = rows.filter(after | F.col("DATE").is_null() if undated else after)
+    elif until is not None:
+        rows = rows.filter(F.col("DATE") <= F.lit(until))
+
+    chart_data = (
+        rows
+        .group_by(period.alias("DATE"), F.col("PRODUCT"))
+        .agg(
+            F.avg("SENTIMENT_SCORE").alias("SENTIMENT_SCORE"),
+            F.count("SENTIMENT_SCORE").alias("REVIEW_COUNT"),
+            F.sum("SENTIMENT_SCORE").alias("SCORE_SUM"),
+            F.min("SENTIMENT_SCORE").alias("SCORE_MIN"),
+            F.max("SENTIMENT_SCORE").alias("SCORE_MAX"),
+        )
+    )
+
+    if time_period == "Weekly":
+        chart_data = chart_data.with_column("WEEK_LABEL", period_label(F.col("DATE"), time_period))
+    elif time_period == "Monthly":
+        chart_data = chart_data.with_column("MONTH_LABEL", period_label(F.col("DATE"), time_period))
+
+    return chart_data.sort(F.col("DATE"), F.col("PRODUCT"))
+
+
+def review_changes(session, before, scored_since=None, table=REVIEWS_TABLE, cache=None):
+    """
+    Check the reviews dated before a watermark for changes a DATE-based delta cannot see.
+
+    score_sentiment.py re-scores and deletes reviews whatever their DATE, and sets SCORED_AT
+    on every review it writes. Reviews before the watermark that were scored after
+    `scored_since`, or a different number of them, mean the old rows changed.
+
+    Args:
+        session: Snowpark session.
+        before (datetime.date): Watermark; only reviews dated before it are checked.
+        scored_since (str): Latest SCORED_AT seen by the previous refresh, as ISO text.
+        table (str): Fully qualified customer reviews table.
+        cache (query_cache.QueryCache): Cache to answer from while the table is unchanged.
+
+    Returns:
+        dict: SCORED_AT (latest of the table, as ISO text), ROWS and SCORES (reviews and
+        scored reviews before `before`) and RESCORED (those written after `scored_since`),
+        or None when the table has no SCORED_AT column because it was never scored.
+    """
+    sql = f"""
+        SELECT
+            TO_VARCHAR(MAX(SCORED_AT), 'YYYY-MM-DD"T"HH24:MI:SS.FF9TZH:TZM') AS SCORED_AT,
+            COUNT_IF(TO_DATE(DATE) < ?) AS ROWS,
+            COUNT_IF(TO_DATE(DATE) < ? AND SENTIMENT_SCORE IS NOT NULL) AS SCORES,
+            COUNT_IF(TO_DATE(DATE) < ? AND SCORED_AT > TO_TIMESTAMP_TZ(?)) AS RESCORED
+        FROM {table}
+    """
+    params = [before, before, before, scored_since]
+
+    def load():
+        return session.sql(sql, params=params).collect()[0].as_dict()
+
+    try:
+        return load() if cache is None else cache.get(session, sql, params, load, tables=(table,))
+    except SnowparkSQLException:
+        return None
+
+
+def reviews_changed(changes, scored_since, count, count_column="ROWS"):
+    """
+    Whether `review_changes` found re-scored, late or deleted reviews before the watermark.
+
+    Args:
+        changes (dict): Result of `review_changes`; None never counts as a change.
+        scored_since (str): SCORED_AT the changes were checked against; without one, any
+            scored table counts as changed, since re-scoring cannot be ruled out.
+        count (int): Number of reviews before the watermark held locally.
+        count_column (str): Column of `changes` that `count` corresponds to.
+    """
+    if changes is None:
+        return False
+    if scored_since is None:
+        return changes["SCORED_AT"] is not None
+    return changes["RESCORED"] > 0 or changes[count_column] != count
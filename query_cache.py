@@ -0,0 +1,222 @@
+"""
+Process-wide query result cache shared by all sessions of the Streamlit app.
+Results are keyed by SQL text and parameters plus the version of every source table, so
+a change to a table (its last commit time in Snowflake, or a local version counter bumped
+by the app) makes the old results unreachable, and they are dropped as soon as the new
+version is seen. Other entries are evicted least recently used once their estimated size
+exceeds a memory budget, and concurrent callers asking for the same missing result wait
+for a single Snowflake call instead of each running it.
+
+Cached values are shared between sessions and must not be modified by callers.
+"""
+
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+import pandas as pd
+import pyarrow as pa
+
+from arrow_fetch import fetch_pandas
+
+# Memory budget for cached results
+MAX_CACHE_BYTES = 256 * 1024 * 1024
+
+# Seconds a table's last commit time is trusted before it is looked up again
+VERSION_TTL = 30
+
+
+def result_size(value):
+    """Estimated in-memory size of a cached result in bytes."""
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(deep=True).sum())
+    if isinstance(value, (pa.Table, pa.RecordBatch)):
+        return value.nbytes
+    if isinstance(value, list):
+        return sys.getsizeof(value) + sum(sys.getsizeof(item) for item in value)
+    return sys.getsizeof(value)
+
+
+def last_commit_time(session, table):
+    """Commit time of the table's last DML or DDL change, from Snowflake's metadata."""
+    return session.sql("SELECT SYSTEM$LAST_CHANGE_COMMIT_TIME(?)", params=[table]).collect()[0][0]
+
+
+class _Flight:
+    """A load in progress that callers asking for the same key wait for."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class QueryCache:
+    def __init__(self, max_bytes=MAX_CACHE_BYTES, version_ttl=VERSION_TTL, commit_time=last_commit_time):
+        """
+        Args:
+            max_bytes (int): Memory budget for cached results.
+            version_ttl (float): Seconds a table's commit time is reused before it is re-read.
+            commit_time (callable): commit_time(session, table) -> change marker of a table.
+        """
+        self.max_bytes = max_bytes
+        self.version_ttl = version_ttl
+        self.commit_time = commit_time
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._flights = {}
+        self._commit_times = {}
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "evictions": self.evictions,
+            "entries": len(self._entries),
+            "bytes": self.bytes,
+        }
+
+    def _join(self, key):
+        """Return (flight, leader): the load in progress for `key`, or a new one to lead. Hold the lock."""
+        flight = self._flights.get(key)
+        if flight is not None:
+            return flight, False
+        flight = self._flights[key] = _Flight()
+        return flight, True
+
+    def _lead(self, key, flight, load, store):
+        """Run load() for everyone waiting on `flight`, storing the value before it is released."""
+        try:
+            flight.value = load()
+            return flight.value
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+                if flight.error is None:
+                    store(flight.value)
+            flight.done.set()
+
+    @staticmethod
+    def _wait(flight):
+        flight.done.wait()
+        if flight.error is not None:
+            raise flight.error
+        return flight.value
+
+    def _drop(self, table):
+        """Remove every cached result read from `table`. Hold the lock."""
+        stale = [key for key in self._entries if any(version[0] == table for version in key[2])]
+        for key in stale:
+            _, size = self._entries.pop(key)
+            self.bytes -= size
+
+    def bump(self, *tables):
+        """Invalidate and drop every cached result read from `tables`, e.g. after the app wrote to them."""
+        with self._lock:
+            for table in tables:
+                self._counters[table] = self._counters.get(table, 0) + 1
+                self._commit_times.pop(table, None)
+                self._drop(table)
+
+    def table_version(self, session, table):
+        """Return the table's (commit time, local counter), re-reading the commit time after `version_ttl`."""
+        key = ("version", table)
+        with self._lock:
+            counter = self._counters.get(table, 0)
+            cached = self._commit_times.get(table)
+            if cached is not None and time.monotonic() - cached[1] < self.version_ttl:
+                return cached[0], counter
+            flight, leader = self._join(key)
+
+        if not leader:
+            return self._wait(flight), counter
+
+        def store(commit_time):
+            previous = self._commit_times.get(table)
+            # Results of the previous commit can no longer be hit; free their memory now
+            if previous is not None and previous[0] != commit_time:
+                self._drop(table)
+            self._commit_times[table] = (commit_time, time.monotonic())
+
+        return self._lead(key, flight, lambda: self.commit_time(session, table), store), counter
+
+    def get(self, session, sql, params, load, tables=()):
+        """
+        Return the cached result of a query, running `load` on a miss.
+
+        Args:
+            session: Snowpark session used for version lookups.
+            sql (str): Query text, part of the cache key.
+            params (tuple): Query parameters, part of the cache key.
+            load (callable): Runs the query and returns its result.
+            tables (tuple): Source tables whose versions are part of the cache key.
+
+        Returns:
+            The result, shared with other callers.
+        """
+        versions = tuple((table, *self.table_version(session, table)) for table in tables)
+        key = (sql, tuple(params), versions)
+
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key][0]
+            flight, leader = self._join(key)
+            if leader:
+                self.misses += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            return self._wait(flight)
+        return self._lead(key, flight, load, lambda value: self._store(key, value))
+
+    def _store(self, key, value):
+        size = result_size(value)
+        # Results larger than the whole budget are returned but never kept
+        if size > self.max_bytes:
+            return
+        self._entries[key] = (value, size)
+        self.bytes += size
+        while self.bytes > self.max_bytes:
+            _, (_, evicted_size) = self._entries.popitem(last=False)
+            self.bytes -= evicted_size
+            self.evictions += 1
+
+    def fetch(self, session, query, schema, tables=()):
+        """
+        Fetch a Snowpark DataFrame through the cache, keyed by its generated SQL.
+
+        Args:
+            session: Snowpark session.
+            query (snowflake.snowpark.DataFrame): Query to run.
+            schema (pa.Schema): Result schema, see arrow_fetch.fetch_pandas.
+            tables (tuple): Source tables of the query.
+
+        Returns:
+            pd.DataFrame: The result, shared with other callers.
+        """
+        sql = query.queries["queries"][-1]
+        return self.get(session, sql, (), lambda: fetch_pandas(query, schema), tables)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._commit_times.clear()
+            self.bytes = 0
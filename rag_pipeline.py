@@ -0,0 +1,195 @@
+"""
+Retrieval pipeline for the RAG chatbot.
+The chat-history rewrite (an LLM round trip) and its Cortex Search call run on a shared
+thread pool next to a speculative search, under one latency budget, and every stage is
+timed.
+
+The functions here never touch `st.session_state`: the app passes in plain values and
+`summarize(chat_history, question)` / `search(query)` callables, so they are safe to run
+on worker threads and easy to exercise offline.
+"""
+
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+# Shared by every session; stages of one question run concurrently on it
+EXECUTOR = ThreadPoolExecutor(max_workers=16, thread_name_prefix="rag")
+
+# Seconds from submission to wait for the chat-history rewrite and its search before
+# answering from the speculative search
+SUMMARY_BUDGET = 2.0
+
+SUMMARY_PROMPT = """
+        [INST]
+        Based on the chat history below and the question, generate a query that extend the question
+        with the chat history provided. The query should be in natural language.
+        Answer with only the query. Do not add any explanation.
+
+        <chat_history>
+        {chat_history}
+        </chat_history>
+
+        <question>
+        {question}
+        </question>
+        [/INST]
+    """
+
+ANSWER_PROMPT = """
+            [INST]
+            You are a helpful AI chat assistant with RAG capabilities. When a user asks you a question,
+            you will also be given context provided between <context> and </context> tags. Use that context
+            with the user's chat history provided in the between <chat_history> and </chat_history> tags
+            to provide a summary that addresses the user's question. Ensure the answer is coherent, concise,
+            and directly relevant to the user's question.
+
+            If the user asks a generic question which cannot be answered with the given context or chat_history,
+            just say "I don't know the answer to that question.
+
+            Don't say things like "according to the provided context".
+
+            <chat_history>
+            {chat_history}
+            </chat_history>
+
+            <context>
+            {context}
+            </context>
+
+            <question>
+            {question}
+            </question>
+            [/INST]
+
+            Answer:
+        """
+
+
+def summary_prompt(chat_history, question):
+    return SUMMARY_PROMPT.format(chat_history=chat_history, question=question)
+
+
+def answer_prompt(chat_history, context, question):
+    return ANSWER_PROMPT.format(chat_history=chat_history, context=context, question=question)
+
+
+def format_context(documents):
+    """Number the retrieved documents the way the answer prompt expects them."""
+    return "".join(
+        f"Context document {i+1}: {document} \n" + "\n"
+        for i, document in enumerate(documents)
+    )
+
+
+def normalize_query(text):
+    """Lowercase and collapse punctuation and whitespace, for comparing queries."""
+    return " ".join(re.sub(r"[^\w\s]", " ", text.lower()).split())
+
+
+def expanded_query(chat_history, question):
+    """Extend the question with the previous user turns, without an LLM round trip."""
+    previous = [m["content"] for m in chat_history if m.get("role") == "user"]
+    return " ".join(previous + [question])
+
+
+def merge_results(result_lists, limit):
+    """
+    Merge ranked result lists with reciprocal rank fusion, dropping duplicate documents.
+    Earlier lists win ties, so pass the most trusted result set first.
+    """
+    documents = {}
+    scores = {}
+    for results in result_lists:
+        for rank, document in enumerate(results):
+            key = normalize_query(document)
+            documents.setdefault(key, document)
+            scores[key] = scores.get(key, 0.0) + 1.0 / (60 + rank)
+    # sorted() is stable, so documents first seen in earlier lists win ties
+    ranked = sorted(scores, key=scores.get, reverse=True)
+    return [documents[key] for key in ranked[:limit]]
+
+
+class Retrieval:
+    """Outcome of `retrieve`: the documents to use, the rewrite, and per-stage timings."""
+
+    def __init__(self, documents, question_summary=None, path="question", timings=None):
+        self.documents = documents
+        self.question_summary = question_summary
+        self.path = path
+        # Copy, since a rewrite that missed its budget may still record its timing later
+        self.timings = dict(timings or {})
+
+    @property
+    def context(self):
+        return format_context(self.documents)
+
+
+def _timed(timings, stage, func, *args):
+    start = time.perf_counter()
+    try:
+        return func(*args)
+    finally:
+        timings[stage] = time.perf_counter() - start
+
+
+def retrieve(question, chat_history, summarize, search, limit, summary_budget=SUMMARY_BUDGET):
+    """
+    Retrieve context documents for a question, overlapping the history rewrite with search.
+
+    Without chat history this is a single search. With chat history, the rewrite -> search
+    chain and one speculative search (the question extended with previous user turns)
+    start at once. If the chain finishes within `summary_budget` seconds of submission,
+    its results are merged with the speculative ones (or the speculative ones are reused
+    when the rewrite matches the extended question); if it runs out of time or fails,
+    e.g. because every model failed, the answer uses the speculative results and the
+    chain drops off the critical path.
+
+    Args:
+        question (str): The user's question.
+        chat_history (list): Previous chat messages, as {"role", "content"} dicts.
+        summarize (callable): summarize(chat_history, question) -> rewritten query.
+        search (callable): search(query) -> ranked list of document texts.
+        limit (int): Maximum number of documents to return.
+        summary_budget (float): Seconds to wait for the rewrite and its search; None waits
+            for them.
+
+    Returns:
+        Retrieval: Documents, rewrite (if used), the path taken and per-stage timings.
+    """
+    timings = {}
+    start = time.perf_counter()
+
+    if not chat_history:
+        documents = _timed(timings, "search_question", search, question)
+        timings["total"] = time.perf_counter() - start
+        return Retrieval(documents[:limit], timings=timings)
+
+    expanded = expanded_query(chat_history, question)
+
+    def summary_chain():
+        question_summary = _timed(timings, "summary", summarize, chat_history, question)
+        if normalize_query(question_summary) == normalize_query(expanded):
+            return question_summary, None
+        return question_summary, _timed(timings, "search_summary", search, question_summary)
+
+    chain_future = EXECUTOR.submit(summary_chain)
+    expanded_future = EXECUTOR.submit(_timed, timings, "search_expanded", search, expanded)
+
+    try:
+        question_summary, summary_documents = chain_future.result(timeout=summary_budget)
+    except TimeoutError:
+        question_summary, summary_documents, path = None, None, "speculative"
+    except Exception:
+        # A failed rewrite must not fail the question; the speculative results are enough
+        question_summary, summary_documents, path = None, None, "summary_failed"
+    else:
+        path = "summary_reused" if summary_documents is None else "summary_merged"
+
+    result_lists = [expanded_future.result()]
+    if summary_documents is not None:
+        result_lists.insert(0, summary_documents)
+
+    documents = _timed(timings, "merge", merge_results, result_lists, limit)
+    timings["total"] = time.perf_counter() - start
+    return Retrieval(documents, question_summary=question_summary, path=path, timings=timings)
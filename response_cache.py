@@ -0,0 +1,162 @@
+"""
+Response cache for the RAG chatbot.
+Search results and answers are cached per scope (search service, model, context
+fingerprint) under the normalized question, with LRU and TTL eviction; completions are
+cached under an exact hash of the model and prompt. When an embedding function is
+supplied, a miss on the exact question falls back to the most similar cached question of
+the same scope, so paraphrases are answered from the cache as well. Questions are only
+embedded when they are looked up or stored, so a lookup costs at most one embedding call.
+"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from rag_pipeline import normalize_query
+
+# Embedding model used for paraphrase lookups
+EMBED_MODEL = "snowflake-arctic-embed-m-v1.5"
+
+# Minimum cosine similarity for a paraphrase to count as a hit
+SIMILARITY_THRESHOLD = 0.92
+
+
+def fingerprint(*parts):
+    """Short stable hash of the given values, e.g. the retrieved context and chat history."""
+    digest = hashlib.sha1()
+    for part in parts:
+        digest.update(str(part).encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()[:16]
+
+
+def cortex_embedder(session, model=EMBED_MODEL):
+    """Build an embed(text) function backed by SNOWFLAKE.CORTEX.EMBED_TEXT_768."""
+    def embed(text):
+        return session.sql(
+            "SELECT snowflake.cortex.embed_text_768(?,?)", (model, text)
+        ).collect()[0][0]
+
+    return embed
+
+
+class ResponseCache:
+    """
+    Thread-safe LRU cache with a TTL and optional embedding-similarity lookup.
+
+    Entries are addressed by a hashable `scope` plus a free-text question; only entries
+    of the same scope are considered for similarity matches.
+    """
+
+    def __init__(self, max_entries=256, ttl=3600, similarity_threshold=SIMILARITY_THRESHOLD,
+                 normalize=normalize_query):
+        """
+        Args:
+            max_entries (int): Maximum number of cached values.
+            ttl (float): Seconds a value stays valid.
+            similarity_threshold (float): Minimum cosine similarity of a paraphrase hit.
+            normalize (callable): Maps a question to its key text; None keys on the exact text.
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.similarity_threshold = similarity_threshold
+        self.normalize = normalize or (lambda text: text)
+        self.hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._vectors = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "semantic_hits": self.semantic_hits,
+            "misses": self.misses,
+            "entries": len(self._entries),
+        }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._vectors.clear()
+
+    def _vector(self, text, embed):
+        """Unit-length embedding of `text`, memoized by normalized text."""
+        with self._lock:
+            vector = self._vectors.get(text)
+        if vector is None:
+            vector = np.asarray(embed(text), dtype="float32")
+            vector /= np.linalg.norm(vector) or 1.0
+            with self._lock:
+                self._vectors[text] = vector
+                while len(self._vectors) > self.max_entries:
+                    self._vectors.popitem(last=False)
+        return vector
+
+    def _expire(self, now):
+        expired = [key for key, (_, expires) in self._entries.items() if expires <= now]
+        for key in expired:
+            del self._entries[key]
+
+    def get(self, scope, question, embed=None):
+        """
+        Look up a cached value.
+
+        Args:
+            scope: Hashable scope of the value, e.g. (service, model, context fingerprint).
+            question (str): The question the value answers.
+            embed (callable): Optional embed(text) -> vector for paraphrase lookups.
+
+        Returns:
+            The cached value, or None on a miss.
+        """
+        text = self.normalize(question)
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            entry = self._entries.get((scope, text))
+            if entry is not None:
+                self._entries.move_to_end((scope, text))
+                self.hits += 1
+                return entry[0]
+            # Only questions embedded when they were stored are compared, so a lookup makes
+            # at most one embedding call
+            candidates = [(self._vectors[other], other) for other_scope, other in self._entries
+                          if other_scope == scope and other in self._vectors]
+
+        if embed is not None and candidates:
+            vector = self._vector(text, embed)
+            similarities = [(float(vector @ other_vector), other) for other_vector, other in candidates]
+            similarity, best = max(similarities)
+            if similarity >= self.similarity_threshold:
+                with self._lock:
+                    entry = self._entries.get((scope, best))
+                    if entry is not None:
+                        self._entries.move_to_end((scope, best))
+                        self.hits += 1
+                        self.semantic_hits += 1
+                        return entry[0]
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, scope, question, value, embed=None):
+        """Store `value`; with `embed`, the question's embedding is kept for paraphrase lookups."""
+        text = self.normalize(question)
+        if embed is not None:
+            self._vector(text, embed)
+        with self._lock:
+            self._entries[(scope, text)] = (value, time.monotonic() + self.ttl)
+            self._entries.move_to_end((scope, text))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return value
@@ -0,0 +1,158 @@
+"""
+Local columnar snapshot of the CUSTOMER_REVIEWS table.
+The snapshot is persisted as Parquet so a cold start reads from disk, and each refresh
+only fetches the rows at or after the last watermark instead of scanning the whole table.
+Only the snapshot's columns are fetched, as Arrow batches with an explicit schema, so
+PRODUCT arrives categorical, scores as float32 and dates as native timestamps.
+
+Reviews can also change behind the watermark: score_sentiment.py re-scores, inserts and
+deletes them whatever their DATE. Each refresh checks the older rows against the table's
+SCORED_AT and row count (queries.review_changes) and reloads the snapshot in full when
+they changed. The SCORED_AT seen is stored in the Parquet metadata.
+"""
+
+import os
+import threading
+import time
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from pandas.api.types import union_categoricals
+from snowflake.snowpark import functions as F
+
+from aggregations import type_reviews
+from arrow_fetch import fetch_pandas, review_schema
+from queries import REVIEW_COLUMNS, REVIEWS_TABLE, TEXT_COLUMNS, review_changes, reviews, reviews_changed
+from tracing import span, traced
+
+SNAPSHOT_PATH = os.path.join(".cache", "customer_reviews.parquet")
+
+# Snapshot that also holds the review text, kept apart so the default one stays small
+TEXT_SNAPSHOT_PATH = os.path.join(".cache", "customer_reviews_text.parquet")
+TEXT_SNAPSHOT_COLUMNS = REVIEW_COLUMNS + TEXT_COLUMNS
+
+# Parquet metadata key holding the latest SCORED_AT the snapshot has seen
+SCORED_AT_KEY = b"avalanche.scored_at"
+
+
+class ReviewSnapshot:
+    def __init__(self, path=SNAPSHOT_PATH, table=REVIEWS_TABLE, watermark_column="DATE", columns=REVIEW_COLUMNS):
+        self.path = path
+        self.table = table
+        self.watermark_column = watermark_column
+        self.columns = list(columns)
+        self.schema = review_schema(self.columns)
+        self.data = None
+        self.scored_at = None
+        self.last_refresh = None
+        self._table = None
+        self._lock = threading.Lock()
+
+    @property
+    def watermark(self):
+        """Latest value of the watermark column held in the snapshot."""
+        if self.data is None or self.data.empty:
+            return None
+        return self.data[self.watermark_column].max()
+
+    @traced("snapshot.load")
+    def load(self):
+        """Load the snapshot from disk, if one has been written before."""
+        if os.path.exists(self.path):
+            table = pq.read_table(self.path)
+            # A snapshot written with other columns is refetched instead
+            if set(self.columns) <= set(table.column_names):
+                # Snapshots written by earlier versions hold object and float64 columns
+                data = table.select(self.columns).to_pandas()
+                self.data = type_reviews(data, score_dtype='float32')
+                scored_at = (table.schema.metadata or {}).get(SCORED_AT_KEY)
+                self.scored_at = scored_at.decode() if scored_at else None
+                self._table = None
+        return self.data
+
+    def arrow(self):
+        """Return the snapshot as an Arrow table, converted once per refresh."""
+        if self._table is None and self.data is not None:
+            self._table = pa.Table.from_pandas(self.data, preserve_index=False)
+        return self._table
+
+    def is_stale(self, max_age):
+        """Whether the snapshot was never refreshed or is older than `max_age` seconds."""
+        return self.last_refresh is None or time.time() - self.last_refresh > max_age
+
+    def refresh(self, session, cache=None):
+        """
+        Fetch new rows from Snowflake and merge them into the snapshot.
+
+        Rows are fetched with `watermark_column >= watermark` so rows that landed late on the
+        boundary value are picked up; the snapshot's rows at the boundary are replaced by
+        the fetched ones, which keeps the merge free of duplicates. Rows without a watermark
+        value (e.g. reviews whose DATE did not parse) cannot be placed before or after the
+        watermark, so they are fetched again by every refresh. When reviews before a
+        DATE watermark were re-scored, added or deleted, the whole table is fetched again.
+
+        Args:
+            session: Snowpark session.
+            cache (query_cache.QueryCache): Shared cache to fetch through, so a refresh of an
+                unchanged table is answered without querying Snowflake.
+
+        Returns:
+            pd.DataFrame: The rows fetched by this refresh (the whole table on a cold start
+            or after older reviews changed); shared with the cache, so not to be modified.
+        """
+        with self._lock:
+            watermark = self.watermark
+            scored_at = self.scored_at
+            if self.watermark_column == "DATE":
+                before = None if watermark is None else pd.Timestamp(watermark).date()
+                with span("snapshot.changes", session=session, table=self.table):
+                    changes = review_changes(session, before, self.scored_at, self.table, cache)
+                if watermark is not None:
+                    kept_rows = int((self.data['DATE'] < watermark).sum())
+                    if reviews_changed(changes, self.scored_at, kept_rows):
+                        watermark = None
+                if changes is not None:
+                    scored_at = changes["SCORED_AT"]
+
+            query = reviews(session, self.table, self.columns)
+            if watermark is not None:
+                value = pd.Timestamp(watermark).to_pydatetime()
+                if self.watermark_column == "DATE":
+                    value = value.date()
+                column = F.col(self.watermark_column)
+                query = query.filter((column >= F.lit(value)) | column.is_null())
+
+            with span("snapshot.to_pandas", session=session, table=self.table):
+                if cache is None:
+                    delta = fetch_pandas(query, self.schema)
+                else:
+                    delta = cache.fetch(session, query, self.schema, tables=(self.table,))
+
+            if watermark is None:
+                self.data = delta
+            else:
+                kept = self.data[self.data[self.watermark_column] < watermark]
+                data = pd.concat([kept, delta], ignore_index=True)
+                # The parts' categories differ when new products appear; merge them
+                if 'PRODUCT' in data:
+                    data['PRODUCT'] = union_categoricals([kept['PRODUCT'], delta['PRODUCT']])
+                self.data = data
+
+            self.scored_at = scored_at
+            self._table = None
+            self._write()
+            self.last_refresh = time.time()
+            return delta
+
+    def _write(self):
+        # Write to a temporary file first so a crash never leaves a truncated snapshot
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        table = pa.Table.from_pandas(self.data, preserve_index=False)
+        metadata = dict(table.schema.metadata or {})
+        if self.scored_at is not None:
+            metadata[SCORED_AT_KEY] = self.scored_at.encode()
+        pq.write_table(table.replace_schema_metadata(metadata), tmp_path)
+        os.replace(tmp_path, self.path)
+
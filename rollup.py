@@ -0,0 +1,149 @@
+"""
+Precomputed sentiment rollup cube for the Avalanche dashboard.
+The cube keeps day x product aggregates (count, sum, min, max) fetched from Snowflake,
+and rolls them up into week x product and month x product aggregates locally. Because
+every measure can be combined, a refresh only fetches the days at or after the last
+watermark and only recomputes the weeks and months those days fall in. When reviews
+before the watermark were re-scored, added or deleted (see queries.review_changes), the
+cube is rebuilt from every day instead.
+"""
+
+import threading
+
+import numpy as np
+import pandas as pd
+
+from aggregations import LABEL_COLUMNS, period_index, period_labels, period_start
+from arrow_fetch import DAILY_SCHEMA, fetch_pandas
+from queries import REVIEWS_TABLE, review_changes, reviews_changed, time_period_query
+from tracing import span, traced
+
+MEASURES = ['REVIEW_COUNT', 'SCORE_SUM', 'SCORE_MIN', 'SCORE_MAX']
+
+
+def combine(cube, keys):
+    """Merge cube rows that share `keys`, combining each measure with its own aggregate."""
+    return (
+        cube
+        .groupby(keys, sort=True, observed=True)
+        .agg(REVIEW_COUNT=('REVIEW_COUNT', 'sum'),
+             SCORE_SUM=('SCORE_SUM', 'sum'),
+             SCORE_MIN=('SCORE_MIN', 'min'),
+             SCORE_MAX=('SCORE_MAX', 'max'))
+        .reset_index()
+    )
+
+
+class SentimentRollup:
+    def __init__(self, table=REVIEWS_TABLE):
+        self.table = table
+        self.cube = {}
+        self.scored_at = None
+        self._lock = threading.Lock()
+
+    @property
+    def watermark(self):
+        """Latest day held in the cube."""
+        days = self.cube.get("Daily")
+        if days is None or days.empty:
+            return None
+        return days['DATE'].max()
+
+    def refresh(self, session, cache=None):
+        """
+        Fetch the day x product aggregates at or after the watermark and update the cube.
+
+        The watermark day itself is fetched again and replaced, so reviews that landed late
+        on that day are counted once. The undated (NULL DATE) group is fetched again by
+        every refresh as well. Only the weeks and months starting at or after the
+        watermark's week and month are rebuilt from the day level. Changed reviews before
+        the watermark make the refresh fetch every day again.
+
+        Args:
+            session: Snowpark session.
+            cache (query_cache.QueryCache): Shared cache to fetch through, so a refresh of an
+                unchanged table is answered without querying Snowflake.
+
+        Returns:
+            pd.DataFrame: The day x product rows fetched by this refresh; shared with the
+            cache, so not to be modified.
+        """
+        with self._lock:
+            watermark = self.watermark
+            since = None if watermark is None else watermark.date()
+            with span("rollup.changes", session=session, table=self.table):
+                changes = review_changes(session, since, self.scored_at, self.table, cache)
+            if watermark is not None:
+                days = self.cube["Daily"]
+                scores = int(days.loc[days['DATE'] < watermark, 'REVIEW_COUNT'].sum())
+                if reviews_changed(changes, self.scored_at, scores, count_column="SCORES"):
+                    watermark, since = None, None
+
+            with span("rollup.to_pandas", session=session, table=self.table):
+                query = time_period_query(session, "Daily", since=since, table=self.table, undated=True)
+                query = query.select(DAILY_SCHEMA.names)
+                if cache is None:
+                    delta = fetch_pandas(query, DAILY_SCHEMA)
+                else:
+                    delta = cache.fetch(session, query, DAILY_SCHEMA, tables=(self.table,))
+
+            days = self.cube.get("Daily")
+            if days is None or watermark is None:
+                days = delta
+            else:
+                days = pd.concat([days[days['DATE'] < watermark], delta], ignore_index=True)
+            cube = {"Daily": days.sort_values(['DATE', 'PRODUCT'], ignore_index=True)}
+
+            with span("rollup.groupby"):
+                for time_period in LABEL_COLUMNS:
+                    cube[time_period] = self._roll_up(cube["Daily"], time_period, watermark)
+
+            self.cube = cube
+            if changes is not None:
+                self.scored_at = changes["SCORED_AT"]
+            return delta
+
+    def _roll_up(self, days, time_period, watermark):
+        """
+        Rebuild the periods starting at or after the watermark's period from the day level.
+        Undated rows count towards the product totals but fall in no week or month.
+        """
+        days = days[days['DATE'].notna()]
+        previous = self.cube.get(time_period)
+        if previous is not None and watermark is not None:
+            day = np.datetime64(watermark, 'D').astype(np.int64)
+            boundary = period_start(period_index(np.array([day]), time_period), time_period)[0]
+            kept = previous[previous['DATE'] < boundary]
+            days = days[days['DATE'] >= boundary]
+        else:
+            kept = None
+
+        index = period_index(days['DATE'].to_numpy(dtype='datetime64[D]').astype(np.int64), time_period)
+        rolled = combine(days.assign(DATE=period_start(index, time_period)), ['DATE', 'PRODUCT'])
+
+        if kept is not None:
+            rolled = pd.concat([kept[['DATE', 'PRODUCT'] + MEASURES], rolled], ignore_index=True)
+        return rolled
+
+    @traced("rollup.time_period")
+    def time_period(self, time_period):
+        """
+        Return the chart rows for the selected time period.
+
+        Returns:
+            pd.DataFrame: One row per period and product with DATE, PRODUCT, SENTIMENT_SCORE
+            (mean), the combinable measures, and WEEK_LABEL or MONTH_LABEL. Undated reviews
+            have no place on a time axis and are only counted by `products()`.
+        """
+        chart_data = self.cube[time_period]
+        chart_data = chart_data[chart_data['DATE'].notna()].copy()
+        chart_data['SENTIMENT_SCORE'] = chart_data['SCORE_SUM'] / chart_data['REVIEW_COUNT']
+        if time_period in LABEL_COLUMNS:
+            chart_data[LABEL_COLUMNS[time_period]] = period_labels(chart_data['DATE'], time_period)
+        return chart_data
+
+    def products(self):
+        """Return the mean SENTIMENT_SCORE and review count per product across all days."""
+        product_data = combine(self.cube["Daily"], ['PRODUCT'])
+        product_data['SENTIMENT_SCORE'] = product_data['SCORE_SUM'] / product_data['REVIEW_COUNT']
+        return product_data
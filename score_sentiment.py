@@ -0,0 +1,207 @@
+"""
+Precomputed sentiment scoring for the CUSTOMER_REVIEWS table.
+Review documents in PARSED_DOCUMENTS are reshaped into PRODUCT, DATE and review text, and
+only reviews that are new, have no score, or whose document hash changed since they were
+scored go through Cortex (TRANSLATE, SUMMARIZE and SENTIMENT). Each batch is scored and
+MERGEd by a single set-based statement, so the dashboard reads stored scores and never
+pays for scoring at query time. Every review written gets a new SCORED_AT. The dashboard's
+snapshot and rollup use it, together with the review count, to notice reviews that were
+re-scored or deleted whatever their DATE (see queries.review_changes).
+
+A local scorer can stand in for Cortex, e.g. in tests; it receives the review texts of a
+batch and returns their scores, and the review text is stored as the SUMMARY:
+
+    score_reviews(session, scorer=lambda texts: [0.0 for _ in texts])
+
+Usage: python score_sentiment.py [--batch-size N] [--workers N]
+"""
+
+import argparse
+
+from parse_documents import PARSED_DOCUMENTS_TABLE, run_batches
+from queries import REVIEWS_TABLE
+
+# Parsed documents holding customer reviews
+REVIEW_PATH_PATTERN = "review-%"
+
+# Reviews scored per MERGE statement, and MERGE statements running at once
+BATCH_SIZE = 50
+MAX_SCORE_WORKERS = 4
+
+# Regular expressions extracting the review fields from the PARSE_DOCUMENT layout, as SQL
+# string literals (the same ones the notebook uses)
+PRODUCT_PATTERN = r"'Product: (.*?) Date:'"
+DATE_PATTERN = r"'Date: (202[0-9]-[0-9]{2}-[0-9]{2})'"
+REVIEW_PATTERN = r"'## Customer Review\n([\\s\\S]*?)$'"
+
+REVIEW_COLUMNS = ["RELATIVE_PATH", "PRODUCT", "DATE", "SUMMARY", "SENTIMENT_SCORE", "REVIEW_HASH"]
+
+
+def ensure_reviews_table(session, table=REVIEWS_TABLE):
+    session.sql(f"""
+        CREATE TABLE IF NOT EXISTS {table} (
+            PRODUCT STRING,
+            DATE DATE,
+            SUMMARY STRING,
+            SENTIMENT_SCORE FLOAT,
+            RELATIVE_PATH STRING,
+            REVIEW_HASH STRING,
+            SCORED_AT TIMESTAMP_LTZ
+        )
+        CLUSTER BY (PRODUCT, DATE)
+    """).collect()
+    # A table loaded from the prepared CSV has none of the bookkeeping columns yet
+    for column, column_type in [("RELATIVE_PATH", "STRING"), ("REVIEW_HASH", "STRING"),
+                                ("SCORED_AT", "TIMESTAMP_LTZ")]:
+        session.sql(f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS {column} {column_type}").collect()
+
+
+def review_source(paths, parsed_table=PARSED_DOCUMENTS_TABLE):
+    """SELECT reshaping the parsed review documents in `paths` (bound as parameters)."""
+    placeholders = ", ".join("?" for _ in paths)
+    return f"""
+        SELECT
+            RELATIVE_PATH,
+            REGEXP_SUBSTR(CONTENT, {PRODUCT_PATTERN}, 1, 1, 'e') AS PRODUCT,
+            TRY_TO_DATE(REGEXP_SUBSTR(CONTENT, {DATE_PATTERN}, 1, 1, 'e')) AS DATE,
+            REGEXP_SUBSTR(CONTENT, {REVIEW_PATTERN}, 1, 1, 'es') AS REVIEW,
+            SHA2(CONTENT) AS REVIEW_HASH
+        FROM {parsed_table}
+        WHERE RELATIVE_PATH IN ({placeholders})
+    """
+
+
+def merge_statement(source, table=REVIEWS_TABLE):
+    """MERGE the scored rows selected by `source` into the reviews table, keyed by document."""
+    updates = ", ".join(f"{column} = s.{column}" for column in REVIEW_COLUMNS[1:])
+    columns = ", ".join(REVIEW_COLUMNS)
+    values = ", ".join(f"s.{column}" for column in REVIEW_COLUMNS)
+    return f"""
+        MERGE INTO {table} t
+        USING ({source}) s
+        ON t.RELATIVE_PATH = s.RELATIVE_PATH
+        WHEN MATCHED THEN UPDATE SET {updates}, SCORED_AT = CURRENT_TIMESTAMP()
+        WHEN NOT MATCHED THEN INSERT ({columns}, SCORED_AT) VALUES ({values}, CURRENT_TIMESTAMP())
+    """
+
+
+def pending_reviews(session, table=REVIEWS_TABLE, parsed_table=PARSED_DOCUMENTS_TABLE):
+    """
+    List the parsed review documents that need scoring.
+
+    Returns:
+        list: RELATIVE_PATH of every review that is not scored yet, has no score, or whose
+        document changed since it was scored, in path order.
+    """
+    rows = session.sql(f"""
+        SELECT p.RELATIVE_PATH
+        FROM {parsed_table} p
+        LEFT JOIN {table} r ON r.RELATIVE_PATH = p.RELATIVE_PATH
+        WHERE p.RELATIVE_PATH LIKE ?
+          AND (r.RELATIVE_PATH IS NULL
+               OR r.SENTIMENT_SCORE IS NULL
+               OR r.REVIEW_HASH IS DISTINCT FROM SHA2(p.CONTENT))
+        ORDER BY p.RELATIVE_PATH
+    """, params=[REVIEW_PATH_PATTERN]).collect()
+    return [row["RELATIVE_PATH"] for row in rows]
+
+
+def merge_cortex_batch(session, paths, table=REVIEWS_TABLE, parsed_table=PARSED_DOCUMENTS_TABLE):
+    """Translate, summarize and score the reviews in `paths` with Cortex and MERGE them, in one statement."""
+    source = f"""
+        SELECT
+            RELATIVE_PATH,
+            PRODUCT,
+            DATE,
+            SNOWFLAKE.CORTEX.SUMMARIZE(TRANSLATED) AS SUMMARY,
+            SNOWFLAKE.CORTEX.SENTIMENT(TRANSLATED) AS SENTIMENT_SCORE,
+            REVIEW_HASH
+        FROM (
+            SELECT *, SNOWFLAKE.CORTEX.TRANSLATE(REVIEW, '', 'en') AS TRANSLATED
+            FROM ({review_source(paths, parsed_table)})
+        )
+    """
+    session.sql(merge_statement(source, table), params=list(paths)).collect()
+
+
+def merge_scored_batch(session, paths, scorer, table=REVIEWS_TABLE, parsed_table=PARSED_DOCUMENTS_TABLE):
+    """Score the reviews in `paths` with a local `scorer` and MERGE them from a VALUES list."""
+    rows = session.sql(review_source(paths, parsed_table), params=list(paths)).collect()
+    if not rows:
+        return
+    scores = scorer([row["REVIEW"] for row in rows])
+
+    params = []
+    for row, score in zip(rows, scores):
+        params.extend([row["RELATIVE_PATH"], row["PRODUCT"], row["DATE"], row["REVIEW"], score, row["REVIEW_HASH"]])
+    placeholders = ", ".join("(?, ?, ?, ?, ?, ?)" for _ in rows)
+    source = f"""
+        SELECT
+            column1 AS RELATIVE_PATH,
+            column2 AS PRODUCT,
+            column3::DATE AS DATE,
+            column4 AS SUMMARY,
+            column5::FLOAT AS SENTIMENT_SCORE,
+            column6 AS REVIEW_HASH
+        FROM VALUES {placeholders}
+    """
+    session.sql(merge_statement(source, table), params=params).collect()
+
+
+def remove_deleted(session, table=REVIEWS_TABLE, parsed_table=PARSED_DOCUMENTS_TABLE):
+    """Delete scored reviews whose document is no longer parsed; returns the row count."""
+    return session.sql(f"""
+        DELETE FROM {table}
+        WHERE RELATIVE_PATH IS NOT NULL
+          AND RELATIVE_PATH NOT IN (SELECT RELATIVE_PATH FROM {parsed_table})
+    """).collect()[0][0]
+
+
+def score_reviews(session, table=REVIEWS_TABLE, parsed_table=PARSED_DOCUMENTS_TABLE, batch_size=BATCH_SIZE,
+                  max_workers=MAX_SCORE_WORKERS, scorer=None):
+    """
+    Score the new and changed parsed reviews into the reviews table.
+
+    Rows without a RELATIVE_PATH (e.g. loaded from the prepared CSV) are left as they are,
+    and a batch that fails, e.g. on a Cortex error, is scored again on the next run.
+
+    Args:
+        session: Snowpark session.
+        table (str): Customer reviews table.
+        parsed_table (str): Parsed documents table filled by parse_documents.py.
+        batch_size (int): Reviews scored per MERGE statement.
+        max_workers (int): Maximum number of MERGE statements running at once.
+        scorer (callable): scorer(texts) -> scores, used instead of Cortex when given.
+
+    Returns:
+        dict: "scored" paths, "failed" (paths, error message) pairs and "removed" row count.
+    """
+    ensure_reviews_table(session, table)
+
+    def score(batch):
+        if scorer is None:
+            merge_cortex_batch(session, batch, table, parsed_table)
+        else:
+            merge_scored_batch(session, batch, scorer, table, parsed_table)
+
+    scored, failed = run_batches(pending_reviews(session, table, parsed_table), score, batch_size, max_workers)
+
+    return {"scored": scored, "failed": failed, "removed": remove_deleted(session, table, parsed_table)}
+
+
+if __name__ == "__main__":
+    from snowflake.snowpark import Session
+
+    parser = argparse.ArgumentParser(description="Score new and changed parsed customer reviews.")
+    parser.add_argument("--table", default=REVIEWS_TABLE)
+    parser.add_argument("--parsed-table", default=PARSED_DOCUMENTS_TABLE)
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--workers", type=int, default=MAX_SCORE_WORKERS)
+    args = parser.parse_args()
+
+    result = score_reviews(Session.builder.getOrCreate(), args.table, args.parsed_table,
+                           args.batch_size, args.workers)
+    for batch, error in result["failed"]:
+        print(f"Error scoring {', '.join(batch)}: {error}")
+    print(f"Scored {len(result['scored'])} reviews, {sum(len(b) for b, _ in result['failed'])} failed, "
+          f"removed {result['removed']} deleted reviews")
@@ -0,0 +1,182 @@
+"""
+Chunking and Cortex Search service build for the chatbot.
+Parsed documents are split with SPLIT_TEXT_RECURSIVE_CHARACTER into DOCUMENT_CHUNKS using
+a configurable chunk size and overlap; only documents whose content or chunk settings
+changed are re-chunked. The Cortex Search service over the chunks is created or updated
+with a target lag, and every run records chunk statistics in CHUNK_STATS so chunk size
+can be tuned against answer latency and token cost.
+
+Usage: python search_index.py [--chunk-size N] [--overlap N] [--target-lag "1 hour"]
+"""
+
+import argparse
+
+from parse_documents import PARSED_DOCUMENTS_TABLE
+
+CHUNKS_TABLE = "AVALANCHE_DB.AVALANCHE_SCHEMA.DOCUMENT_CHUNKS"
+CHUNK_STATS_TABLE = "AVALANCHE_DB.AVALANCHE_SCHEMA.CHUNK_STATS"
+SEARCH_SERVICE = "AVALANCHE_DB.AVALANCHE_SCHEMA.DOCUMENT_SEARCH"
+
+# Characters per chunk and characters shared by consecutive chunks
+CHUNK_SIZE = 1000
+CHUNK_OVERLAP = 100
+
+TARGET_LAG = "1 hour"
+
+# Rough characters per token, for the token estimates in CHUNK_STATS
+CHARS_PER_TOKEN = 4
+
+
+def ensure_chunk_tables(session, chunks_table=CHUNKS_TABLE, stats_table=CHUNK_STATS_TABLE):
+    session.sql(f"""
+        CREATE TABLE IF NOT EXISTS {chunks_table} (
+            RELATIVE_PATH STRING,
+            DOC_TYPE STRING,
+            MD5 STRING,
+            CHUNK_INDEX NUMBER,
+            CHUNK STRING,
+            CHUNK_SIZE NUMBER,
+            CHUNK_OVERLAP NUMBER
+        )
+    """).collect()
+    session.sql(f"""
+        CREATE TABLE IF NOT EXISTS {stats_table} (
+            RUN_AT TIMESTAMP_LTZ,
+            DOC_TYPE STRING,
+            CHUNK_SIZE NUMBER,
+            CHUNK_OVERLAP NUMBER,
+            DOCUMENTS NUMBER,
+            CHUNKS NUMBER,
+            AVG_CHUNK_CHARS FLOAT,
+            MAX_CHUNK_CHARS NUMBER,
+            AVG_CHUNK_TOKENS FLOAT
+        )
+    """).collect()
+
+
+def chunk_documents(session, chunk_size=CHUNK_SIZE, overlap=CHUNK_OVERLAP,
+                    parsed_table=PARSED_DOCUMENTS_TABLE, chunks_table=CHUNKS_TABLE):
+    """
+    Bring DOCUMENT_CHUNKS in line with the parsed documents.
+
+    Chunks of documents that were removed, re-parsed with new content (different MD5) or
+    chunked with other settings are deleted, and every document without chunks is split
+    again, in one transaction.
+
+    Returns:
+        tuple: (deleted, inserted) chunk counts.
+    """
+    session.sql("BEGIN").collect()
+    try:
+        deleted = session.sql(f"""
+            DELETE FROM {chunks_table} c
+            WHERE c.CHUNK_SIZE <> ? OR c.CHUNK_OVERLAP <> ?
+               OR NOT EXISTS (
+                   SELECT 1 FROM {parsed_table} p
+                   WHERE p.RELATIVE_PATH = c.RELATIVE_PATH AND p.MD5 IS NOT DISTINCT FROM c.MD5
+               )
+        """, params=[chunk_size, overlap]).collect()[0][0]
+        inserted = session.sql(f"""
+            INSERT INTO {chunks_table}
+            SELECT
+                p.RELATIVE_PATH,
+                LOWER(SPLIT_PART(p.RELATIVE_PATH, '-', 1)) AS DOC_TYPE,
+                p.MD5,
+                f.INDEX AS CHUNK_INDEX,
+                f.VALUE::STRING AS CHUNK,
+                ? AS CHUNK_SIZE,
+                ? AS CHUNK_OVERLAP
+            FROM {parsed_table} p,
+                LATERAL FLATTEN(
+                    SNOWFLAKE.CORTEX.SPLIT_TEXT_RECURSIVE_CHARACTER(p.CONTENT, 'markdown', ?, ?)
+                ) f
+            WHERE p.CONTENT IS NOT NULL
+              AND NOT EXISTS (SELECT 1 FROM {chunks_table} c WHERE c.RELATIVE_PATH = p.RELATIVE_PATH)
+        """, params=[chunk_size, overlap, chunk_size, overlap]).collect()[0][0]
+        session.sql("COMMIT").collect()
+    except Exception:
+        session.sql("ROLLBACK").collect()
+        raise
+    return deleted, inserted
+
+
+def record_chunk_stats(session, chunks_table=CHUNKS_TABLE, stats_table=CHUNK_STATS_TABLE):
+    """Append per-document-type chunk statistics for this run and return them."""
+    session.sql(f"""
+        INSERT INTO {stats_table}
+        SELECT
+            CURRENT_TIMESTAMP(),
+            DOC_TYPE,
+            ANY_VALUE(CHUNK_SIZE),
+            ANY_VALUE(CHUNK_OVERLAP),
+            COUNT(DISTINCT RELATIVE_PATH),
+            COUNT(*),
+            AVG(LENGTH(CHUNK)),
+            MAX(LENGTH(CHUNK)),
+            AVG(LENGTH(CHUNK)) / {CHARS_PER_TOKEN}
+        FROM {chunks_table}
+        GROUP BY DOC_TYPE
+    """).collect()
+    return session.sql(f"""
+        SELECT * FROM {stats_table}
+        WHERE RUN_AT = (SELECT MAX(RUN_AT) FROM {stats_table})
+        ORDER BY DOC_TYPE
+    """).collect()
+
+
+def build_search_service(session, service=SEARCH_SERVICE, target_lag=TARGET_LAG, warehouse=None,
+                         chunks_table=CHUNKS_TABLE, refresh=True):
+    """
+    Create the Cortex Search service over DOCUMENT_CHUNKS, or update its target lag.
+
+    Args:
+        session: Snowpark session.
+        service (str): Fully qualified service name.
+        target_lag (str): Maximum staleness of the service, e.g. "1 hour".
+        warehouse (str): Warehouse for refreshes; defaults to the session's warehouse.
+        chunks_table (str): Table the service indexes.
+        refresh (bool): Refresh the service now instead of waiting for the target lag.
+    """
+    warehouse = warehouse or session.get_current_warehouse()
+    session.sql(f"""
+        CREATE CORTEX SEARCH SERVICE IF NOT EXISTS {service}
+            ON CHUNK
+            ATTRIBUTES DOC_TYPE, RELATIVE_PATH
+            WAREHOUSE = {warehouse}
+            TARGET_LAG = '{target_lag}'
+        AS
+            SELECT CHUNK, DOC_TYPE, RELATIVE_PATH FROM {chunks_table}
+    """).collect()
+    session.sql(f"ALTER CORTEX SEARCH SERVICE {service} SET TARGET_LAG = '{target_lag}'").collect()
+    if refresh:
+        session.sql(f"ALTER CORTEX SEARCH SERVICE {service} REFRESH").collect()
+
+
+def build_index(session, chunk_size=CHUNK_SIZE, overlap=CHUNK_OVERLAP, target_lag=TARGET_LAG,
+                service=SEARCH_SERVICE, warehouse=None):
+    """Chunk changed documents, update the search service and record chunk statistics."""
+    ensure_chunk_tables(session)
+    deleted, inserted = chunk_documents(session, chunk_size, overlap)
+    # The service only needs an immediate refresh when its source rows changed
+    build_search_service(session, service, target_lag, warehouse, refresh=bool(deleted or inserted))
+    return deleted, inserted, record_chunk_stats(session)
+
+
+if __name__ == "__main__":
+    from snowflake.snowpark import Session
+
+    parser = argparse.ArgumentParser(description="Chunk parsed documents and build the Cortex Search service.")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--overlap", type=int, default=CHUNK_OVERLAP)
+    parser.add_argument("--target-lag", default=TARGET_LAG)
+    parser.add_argument("--service", default=SEARCH_SERVICE)
+    parser.add_argument("--warehouse")
+    args = parser.parse_args()
+
+    deleted, inserted, stats = build_index(Session.builder.getOrCreate(), args.chunk_size, args.overlap,
+                                           args.target_lag, args.service, args.warehouse)
+    print(f"Removed {deleted} chunks, added {inserted} chunks")
+    for row in stats:
+        print(f"{row['DOC_TYPE']}: {row['DOCUMENTS']} documents, {row['CHUNKS']} chunks, "
+              f"avg {row['AVG_CHUNK_CHARS']:.0f} chars (~{row['AVG_CHUNK_TOKENS']:.0f} tokens), "
+              f"max {row['MAX_CHUNK_CHARS']} chars")
@@ -0,0 +1,46 @@
+"""
+Cortex Search service discovery for the chatbot.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+
+# Upper bound on concurrent DESC CORTEX SEARCH SERVICE queries
+MAX_DESCRIBE_WORKERS = 8
+
+
+def describe_search_services(session, max_workers=MAX_DESCRIBE_WORKERS):
+    """
+    List the Cortex Search services of the current schema with their search column.
+
+    Recent accounts report the search column in SHOW CORTEX SEARCH SERVICES itself, in which
+    case no further query is needed. Otherwise the DESC queries run concurrently, so the
+    discovery latency is about one round trip instead of one per service.
+
+    Args:
+        session: Snowpark session.
+        max_workers (int): Maximum number of concurrent DESC queries.
+
+    Returns:
+        list: One {"name": ..., "search_column": ...} dict per service.
+    """
+    services = [s.as_dict() for s in session.sql("SHOW CORTEX SEARCH SERVICES;").collect()]
+    if not services:
+        return []
+
+    names = [s["name"] for s in services]
+    search_columns = [s.get("search_column") for s in services]
+
+    missing = [i for i, column in enumerate(search_columns) if not column]
+    if missing:
+        def describe(name):
+            return session.sql(f"DESC CORTEX SEARCH SERVICE {name};").collect()[0]["search_column"]
+
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(missing))) as executor:
+            described = executor.map(describe, [names[i] for i in missing])
+            for i, column in zip(missing, described):
+                search_columns[i] = column
+
+    return [
+        {"name": name, "search_column": column}
+        for name, column in zip(names, search_columns)
+    ]
@@ -0,0 +1,193 @@
+"""
+Bounded pool of Snowpark sessions for the Streamlit app.
+Each browser session borrows a Snowpark session for the duration of a unit of work
+instead of sharing one connection, idle sessions are health-checked before reuse, and
+every session carries a query tag. The pool can be warmed at server start so the first
+user does not pay for connecting, authenticating and the first query.
+
+Sessions come from a factory, so a local-testing session works as well:
+
+    pool = SessionPool(lambda: Session.builder.config("local_testing", True).create(),
+                       query_tag=None, health_check=dataframe_ping)
+"""
+
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+SESSION_POOL_SIZE = 4
+
+# Seconds a session may sit idle before it is health-checked on its next lease
+HEALTH_CHECK_INTERVAL = 60
+
+# Seconds to wait for a free session when all of them are leased
+LEASE_TIMEOUT = 30
+
+logger = logging.getLogger(__name__)
+
+
+class LeaseTimeout(TimeoutError):
+    """No pooled session became free in time; the caller can tell the user to retry."""
+
+
+def ping(session):
+    session.sql("SELECT 1").collect()
+
+
+def dataframe_ping(session):
+    """Health check that also runs on local-testing sessions, which do not support SQL."""
+    session.create_dataframe([[1]]).collect()
+
+
+class PooledSession:
+    """A pooled Snowpark session and the objects prepared for it (e.g. a `Root`)."""
+
+    def __init__(self, session, state, slot):
+        self.session = session
+        self.state = state
+        self.slot = slot
+        self.last_used = time.monotonic()
+
+
+class SessionPool:
+    def __init__(self, factory, size=SESSION_POOL_SIZE, query_tag="avalanche", prepare=None,
+                 health_check=ping, health_check_interval=HEALTH_CHECK_INTERVAL, close_sessions=True):
+        """
+        Args:
+            factory (callable): Creates a new Snowpark session.
+            size (int): Maximum number of sessions.
+            query_tag (str): Query tag prefix; each session is tagged "<query_tag>:<slot>".
+                None leaves the tag unset.
+            prepare (callable): prepare(session) -> per-session state, built once per session.
+            health_check (callable): health_check(session) raising when the session is unusable.
+            health_check_interval (float): Idle seconds after which a session is checked.
+            close_sessions (bool): Close sessions that are discarded; False for sessions the
+                pool does not own, e.g. the active session of Streamlit in Snowflake.
+        """
+        self.factory = factory
+        self.size = size
+        self.query_tag = query_tag
+        self.prepare = prepare
+        self.health_check = health_check
+        self.health_check_interval = health_check_interval
+        self.close_sessions = close_sessions
+        self.created = 0
+        self.replaced = 0
+        # Slot numbers only ever increase, so a slot given back is never numbered twice
+        self._slots = 0
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+
+    def _discard(self, session):
+        if not self.close_sessions:
+            return
+        try:
+            session.close()
+        except Exception:
+            pass
+
+    def _create(self, slot):
+        session = None
+        try:
+            session = self.factory()
+            if self.query_tag:
+                session.query_tag = f"{self.query_tag}:{slot}"
+            # The first query pays for warehouse resume and metadata loading; do it up front
+            self.health_check(session)
+            state = self.prepare(session) if self.prepare else None
+        except Exception:
+            if session is not None:
+                self._discard(session)
+            # Give the slot back, so a later lease can try again
+            with self._lock:
+                self.created -= 1
+            raise
+        return PooledSession(session, state, slot)
+
+    def _reserve_slot(self):
+        with self._lock:
+            if self.created >= self.size:
+                return None
+            self.created += 1
+            self._slots += 1
+            return self._slots
+
+    def warm(self, count=None):
+        """
+        Create up to `count` sessions (default: all) concurrently and make them idle.
+
+        A session that cannot be created is logged and its slot given back, so the other
+        sessions are still pooled and a later lease can try again.
+
+        Returns:
+            int: Number of sessions created.
+        """
+        slots = [slot for slot in (self._reserve_slot() for _ in range(count or self.size)) if slot]
+        if not slots:
+            return 0
+
+        def create(slot):
+            try:
+                self._idle.put(self._create(slot))
+                return True
+            except Exception:
+                logger.exception("Could not create pooled Snowflake session %s", slot)
+                return False
+
+        with ThreadPoolExecutor(max_workers=len(slots)) as executor:
+            return sum(executor.map(create, slots))
+
+    def _healthy(self, pooled):
+        if time.monotonic() - pooled.last_used < self.health_check_interval:
+            return True
+        try:
+            self.health_check(pooled.session)
+            return True
+        except Exception:
+            return False
+
+    def acquire(self, timeout=LEASE_TIMEOUT):
+        """Borrow a session, creating one if the pool is not full; pair with `release`."""
+        try:
+            pooled = self._idle.get_nowait()
+        except queue.Empty:
+            slot = self._reserve_slot()
+            if slot is not None:
+                return self._create(slot)
+            try:
+                pooled = self._idle.get(timeout=timeout)
+            except queue.Empty:
+                raise LeaseTimeout(f"No Snowflake session became free within {timeout}s") from None
+
+        if not self._healthy(pooled):
+            self._discard(pooled.session)
+            self.replaced += 1
+            pooled = self._create(pooled.slot)
+        return pooled
+
+    def release(self, pooled):
+        pooled.last_used = time.monotonic()
+        self._idle.put(pooled)
+
+    @contextmanager
+    def lease(self, timeout=LEASE_TIMEOUT):
+        """Borrow a session for the duration of a `with` block."""
+        pooled = self.acquire(timeout)
+        try:
+            yield pooled
+        finally:
+            self.release(pooled)
+
+    @property
+    def idle(self):
+        return self._idle.qsize()
+
+    def close(self):
+        while True:
+            try:
+                self._discard(self._idle.get_nowait().session)
+            except queue.Empty:
+                return
@@ -13,6 +13,8 @@ CREATE STAGE IF NOT EXISTS avalanche_db.avalanche_schema.customer_reviews
   DIRECTORY = (ENABLE = true);
 --
 -- Now go and upload files to the stage. 
+-- Or generate and upload them from the assets folder, skipping files already on the stage:
+--   python split-files.py --upload @avalanche_db.avalanche_schema.customer_reviews
 -- Once you've done that proceed to the next step
 
 -- Option 2: Push files to Stage from S3
@@ -59,3 +61,42 @@ ls @avalanche_db.avalanche_schema.customer_reviews;
 --     {'mode': 'layout'}
 --   ):content AS layout
 -- FROM files;
+
+-- STEP 5
+-- Persist parsed documents
+-- parse_documents.py fills this table with PARSE_DOCUMENT output, parsing only files
+-- that are new or changed (by directory table MD5) since its last run:
+--   python parse_documents.py
+CREATE TABLE IF NOT EXISTS avalanche_db.avalanche_schema.parsed_documents (
+  relative_path STRING PRIMARY KEY,
+  file_url STRING,
+  md5 STRING,
+  last_modified TIMESTAMP_TZ,
+  size NUMBER,
+  content STRING,
+  parsed_at TIMESTAMP_LTZ
+);
+
+-- STEP 6
+-- Chunk the parsed documents and build the Cortex Search service
+-- search_index.py splits parsed documents into chunks (re-chunking only changed documents),
+-- creates or updates the DOCUMENT_SEARCH service and records chunk statistics:
+--   python search_index.py --chunk-size 1000 --overlap 100 --target-lag "1 hour"
+-- Compare chunk sizes across runs with:
+-- SELECT * FROM avalanche_db.avalanche_schema.chunk_stats ORDER BY run_at DESC, doc_type;
+
+-- STEP 7
+-- Score the parsed reviews into CUSTOMER_REVIEWS
+-- score_sentiment.py reshapes the parsed review documents into PRODUCT, DATE and review text,
+-- and runs Cortex TRANSLATE, SUMMARIZE and SENTIMENT only for reviews that are new, unscored
+-- or whose document changed, MERGEing each batch into CUSTOMER_REVIEWS:
+--   python score_sentiment.py --batch-size 50 --workers 4
+
+-- STEP 8
+-- Cluster CUSTOMER_REVIEWS for the dashboard's filters
+-- The Product tab's drill-down filters with PRODUCT IN (...) AND DATE BETWEEN ..., so
+-- clustering by product (low cardinality first) and then date lets Snowflake prune the
+-- micro-partitions outside the selection instead of scanning the whole table:
+ALTER TABLE IF EXISTS avalanche_db.avalanche_schema.customer_reviews CLUSTER BY (product, date);
+-- Check how well the table is clustered with:
+-- SELECT SYSTEM$CLUSTERING_INFORMATION('avalanche_db.avalanche_schema.customer_reviews', '(product, date)');
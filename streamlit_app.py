@@ -3,62 +3,160 @@
 # SELECT * FROM AVALANCHE_DB.PUBLIC.CUSTOMER_REVIEWS;
 
 # M2 Lab2
+import threading
+import time
 import streamlit as st
-import altair as alt
 import pandas as pd
+from snowflake.snowpark import Session
 from snowflake.snowpark.context import get_active_session
+from snowflake.snowpark.exceptions import SnowparkSessionException
 from snowflake.core import Root # requires snowflake>=0.8.0
+from aggregations import LABEL_COLUMNS, TIME_PERIODS, period_encodings, sentiment_metrics
+from arrow_fetch import period_schema
+from charts import CHART_POINT_BUDGET, product_bar_chart, product_trend_chart, sentiment_chart
+from completions import TimedStream, get_backend
+from context_assembly import assemble_context
+from data_browser import PAGE_SIZES, SORTABLE_COLUMNS, filter_reviews, page_count, review_page
+from review_snapshot import TEXT_SNAPSHOT_COLUMNS, TEXT_SNAPSHOT_PATH, ReviewSnapshot
+from model_router import ANSWER_LATENCY_BUDGET, ModelRouter
+from queries import REVIEWS_TABLE, time_period_query
+from query_cache import QueryCache
+from rag_pipeline import answer_prompt, retrieve, summary_prompt
+from response_cache import ResponseCache, cortex_embedder, fingerprint
+from rollup import SentimentRollup, combine
+from search_services import describe_search_services
+from session_pool import LeaseTimeout, SessionPool
+from tracing import TRACER, span
 # Install snowflake.core
 
-# Get the current credentials
-# session = get_active_session()
-session = st.connection("snowflake").session()
-
 st.set_page_config(page_title="Avalanche Data Set",
                     page_icon="🏔️",
                     layout="wide")
 
+# Get the current credentials
+# session = get_active_session()
+def connection_parameters():
+    """Parameters of the "snowflake" connection in secrets.toml; empty uses connections.toml."""
+    try:
+        return dict(st.secrets["connections"]["snowflake"])
+    except (KeyError, FileNotFoundError):
+        return {}
+
+def session_factory(params):
+    """
+    Return a function creating sessions from `params`, or from the default connection in
+    connections.toml when empty, which is resolved once here.
+    """
+    if not params:
+        from snowflake.connector.config_manager import _get_default_connection_params
+        params = _get_default_connection_params()
+
+    def create_session():
+        # A builder drops the password once it has created a session, so never share one
+        return Session.SessionBuilder().configs(dict(params)).create()
+    return create_session
+
+def active_session():
+    """The session Streamlit in Snowflake provides, or None when the app runs elsewhere."""
+    try:
+        return get_active_session()
+    except SnowparkSessionException:
+        return None
+
+def prepare_session(session):
+    """Objects built once per pooled session instead of on every rerun."""
+    return {
+        "root": Root(session),
+        "backend": get_backend(session),
+        "embed": cortex_embedder(session),
+    }
+
+@st.cache_resource(show_spinner="Connecting to Snowflake...")
+def get_session_pool():
+    """
+    Process-wide pool of Snowpark sessions. One session is warmed before the first page
+    renders and the rest in the background, each with its first query and Root done.
+
+    Without credentials, e.g. in Streamlit in Snowflake, new sessions cannot be created;
+    the app's active session is then the pool's only session and is never closed.
+    """
+    # Look for an active session before the pool creates any, which would become active too
+    params = connection_parameters()
+    session = None if params else active_session()
+    if session is not None:
+        pool = SessionPool(lambda: session, size=1, query_tag="avalanche-streamlit",
+                           prepare=prepare_session, close_sessions=False)
+    else:
+        pool = SessionPool(session_factory(params), query_tag="avalanche-streamlit", prepare=prepare_session)
+    pool.warm(1)
+    threading.Thread(target=pool.warm, daemon=True).start()
+    return pool
+
+session_pool = get_session_pool()
+
 st.title("🏔️ Avalanche Data Set")
 
-df = session.sql("SELECT * FROM AVALANCHE_DB.AVALANCHE_SCHEMA.CUSTOMER_REVIEWS").to_pandas()
+# Seconds before the local review snapshot is refreshed with a delta query
+SNAPSHOT_REFRESH_INTERVAL = 300
+
+@st.cache_resource
+def get_review_snapshot(include_text=False):
+    """
+    Process-wide review snapshot, loaded from the local Parquet cache on cold start.
+    The review text is only fetched into a separate snapshot once the Data tab shows it.
+    """
+    if include_text:
+        snapshot = ReviewSnapshot(path=TEXT_SNAPSHOT_PATH, columns=TEXT_SNAPSHOT_COLUMNS)
+    else:
+        snapshot = ReviewSnapshot()
+    snapshot.load()
+    return snapshot
+
+@st.cache_resource
+def get_sentiment_rollup():
+    """Process-wide day/week/month x product rollup cube shared by all tabs."""
+    return SentimentRollup()
+
+@st.cache_resource
+def get_query_cache():
+    """
+    Process-wide query result cache; results are shared across sessions until the
+    source table changes, and concurrent identical queries run once.
+    """
+    return QueryCache()
+
+review_snapshot = get_review_snapshot()
+sentiment_rollup = get_sentiment_rollup()
+query_cache = get_query_cache()
+refresh_requested = st.sidebar.button("Refresh data")
+if refresh_requested:
+    # Don't wait for the next commit time check to drop results read before the refresh
+    query_cache.bump(REVIEWS_TABLE)
+if (refresh_requested
+        or review_snapshot.is_stale(SNAPSHOT_REFRESH_INTERVAL)
+        or sentiment_rollup.watermark is None):
+    try:
+        with session_pool.lease() as lease, span("data.refresh"):
+            # Refreshes of an unchanged table are answered from the query cache
+            review_snapshot.refresh(lease.session, query_cache)
+            sentiment_rollup.refresh(lease.session, query_cache)
+    except LeaseTimeout:
+        st.error("All Snowflake sessions are busy, so the data could not be refreshed. Please try again shortly.")
+        if review_snapshot.data is None or sentiment_rollup.watermark is None:
+            st.stop()
+
+df = review_snapshot.data
 # # # df = pd.read_csv("data/customer_reviews.csv")
 # df
 
-# Ensure SENTIMENT_SCORE is numeric
-df['SENTIMENT_SCORE'] = pd.to_numeric(df['SENTIMENT_SCORE'])
-
-# Convert DATE to datetime explicitly
-df['DATE'] = pd.to_datetime(df['DATE'])
-
-# Add date components
-df['DAY'] = df['DATE'].dt.day
-df['WEEK'] = df['DATE'].dt.isocalendar().week
-df['MONTH'] = df['DATE'].dt.month
-df['YEAR'] = df['DATE'].dt.year
-
-# Product sentiment score
-product_bar_chart = alt.Chart(df).mark_bar(size=15).encode(
-    y=alt.Y('PRODUCT:N',
-            axis=alt.Axis(
-                labelAngle=0,  # Horizontal labels
-                labelOverlap=False,  # Prevent label overlap
-                labelPadding=10  # Add some padding
-            )
-    ),
-    x=alt.X('mean(SENTIMENT_SCORE):Q',  # Aggregate mean sentiment score
-            title='MEAN SENTIMENT_SCORE'),
-    color=alt.condition(
-        alt.datum.mean_SENTIMENT_SCORE >= 0,
-        alt.value('#2ecc71'),  # green for positive
-        alt.value('#e74c3c')   # red for negative
-    ),
-    tooltip=['PRODUCT:N', 'mean(SENTIMENT_SCORE):Q']
-).properties(
-    height=400
-)
+# Product sentiment score (read from the rollup cube)
+product_data = sentiment_rollup.products()
+
+with span("chart.build", chart="product"):
+    product_chart = product_bar_chart(product_data)
 
 # Create tabs
-tab = st.tabs(['Daily / Weekly / Monthly', 'Product', 'Data', 'Chat'])
+tab = st.tabs(['Daily / Weekly / Monthly', 'Product', 'Data', 'Chat', 'Performance'])
 # tab = st.tabs(['Daily / Weekly / Monthly', 'Product', 'Data'])
 
 # Display the chart
@@ -68,44 +166,15 @@ with tab[0]:
     # Add time period selection
     time_period = st.selectbox(
         "Select time period",
-        options=["Daily", "Weekly", "Monthly"]
+        options=TIME_PERIODS
     )
 
-    # Process data based on selected time period
-    if time_period == "Daily":
-        period_label = "Daily"
-        chart_data = df.copy()
-        x_encoding = alt.X('DATE:T', axis=alt.Axis(format='%Y-%m-%d', labelAngle=90))
-        tooltip_encoding = ['DATE:T', 'SENTIMENT_SCORE:Q', 'PRODUCT:N']
-        avg_sentiment = chart_data['SENTIMENT_SCORE'].mean()
-        highest_sentiment = chart_data['SENTIMENT_SCORE'].max()
-        lowest_sentiment = chart_data['SENTIMENT_SCORE'].min()
-
-    elif time_period == "Weekly":
-        period_label = "Weekly"
-        chart_data = df.groupby(['YEAR', 'WEEK', 'PRODUCT']).agg(
-            SENTIMENT_SCORE=('SENTIMENT_SCORE', 'mean'),
-            DATE=('DATE', 'first')
-        ).reset_index()
-        chart_data['WEEK_LABEL'] = chart_data.apply(lambda row: f"{row['YEAR']}-W{int(row['WEEK']):02d}", axis=1)
-        x_encoding = alt.X('WEEK_LABEL:N', sort=None, title='Week') # Use nominal type for explicit labels
-        tooltip_encoding = ['WEEK_LABEL:N', 'SENTIMENT_SCORE:Q', 'PRODUCT:N']
-        avg_sentiment = chart_data['SENTIMENT_SCORE'].mean()
-        highest_sentiment = chart_data['SENTIMENT_SCORE'].max()
-        lowest_sentiment = chart_data['SENTIMENT_SCORE'].min()
-
-    else:  # Monthly
-        period_label = "Monthly"
-        chart_data = df.groupby(['YEAR', 'MONTH', 'PRODUCT']).agg(
-            SENTIMENT_SCORE=('SENTIMENT_SCORE', 'mean'),
-            DATE=('DATE', 'first')
-        ).reset_index()
-        chart_data['MONTH_LABEL'] = chart_data.apply(lambda row: f"{row['YEAR']}-{row['MONTH']:02d}", axis=1)
-        x_encoding = alt.X('MONTH_LABEL:N', sort=None, title='Month') # Use nominal type for explicit labels
-        tooltip_encoding = ['MONTH_LABEL:N', 'SENTIMENT_SCORE:Q', 'PRODUCT:N']
-        avg_sentiment = chart_data['SENTIMENT_SCORE'].mean()
-        highest_sentiment = chart_data['SENTIMENT_SCORE'].max()
-        lowest_sentiment = chart_data['SENTIMENT_SCORE'].min()
+    # Read the precomputed period x product aggregates from the rollup cube
+    period_label = time_period
+    chart_data = sentiment_rollup.time_period(time_period)
+
+    x_encoding, tooltip_encoding = period_encodings(time_period)
+    avg_sentiment, highest_sentiment, lowest_sentiment = sentiment_metrics(chart_data, time_period)
 
     # Display metrics
     col1, col2, col3 = st.columns(3)
@@ -127,53 +196,140 @@ with tab[0]:
             value=f"{lowest_sentiment:.2f}" if 'lowest_sentiment' in locals() else "N/A",
         )
 
-    # Update chart based on selected period
-    sentiment_chart = alt.Chart(chart_data).mark_bar(size=15).encode(
-        x=x_encoding,
-        y=alt.Y('SENTIMENT_SCORE:Q'),
-        color=alt.condition(
-            alt.datum.SENTIMENT_SCORE >= 0,
-            alt.value('#2ecc71'),  # green for positive
-            alt.value('#e74c3c')   # red for negative
-        ),
-        tooltip=tooltip_encoding
-    ).properties(
-        height=400
-    )
+    # Update chart based on selected period, downsampled to the chart point budget
+    with span("chart.build", chart="period", time_period=time_period):
+        period_chart = sentiment_chart(chart_data, x_encoding, tooltip_encoding, max_points=CHART_POINT_BUDGET)
 
-    st.altair_chart(sentiment_chart, use_container_width=True)
+    st.altair_chart(period_chart, use_container_width=True)
 
 with tab[1]:
     st.subheader('Product sentiment score')
-    st.altair_chart(product_bar_chart, use_container_width=True)
+    st.altair_chart(product_chart, use_container_width=True)
+
+    # Drill down into selected products; the filters are pushed into the Snowflake query
+    # and its result is shared with other sessions through the query cache
+    if st.toggle("Drill down", value=False):
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            drill_products = st.multiselect("Products", options=product_data['PRODUCT'].tolist(),
+                                            key="drill_products")
+        with col2:
+            drill_dates = st.date_input(
+                "Date range",
+                value=(df['DATE'].min().date(), df['DATE'].max().date()),
+                key="drill_dates",
+            )
+        with col3:
+            drill_period = st.selectbox("Time period", options=TIME_PERIODS, key="drill_period")
+
+        # The date input returns a single date while the range is being picked
+        if not drill_products or len(drill_dates) != 2:
+            st.caption("Select one or more products and a date range.")
+        else:
+            try:
+                with session_pool.lease() as lease, span("drilldown.query", session=lease.session,
+                                                          products=len(drill_products), time_period=drill_period):
+                    drill_query = time_period_query(lease.session, drill_period, since=drill_dates[0],
+                                                    until=drill_dates[1], products=drill_products)
+                    drill_data = query_cache.fetch(lease.session, drill_query,
+                                                   period_schema(LABEL_COLUMNS.get(drill_period)),
+                                                   tables=(REVIEWS_TABLE,))
+            except LeaseTimeout:
+                st.error("All Snowflake sessions are busy. Please try the drill-down again shortly.")
+                drill_data = None
+
+            if drill_data is None:
+                pass
+            elif drill_data.empty:
+                st.caption("No reviews match the selection.")
+            else:
+                # Review count and mean sentiment per product over the selected range
+                drill_totals = combine(drill_data, ['PRODUCT'])
+                drill_totals['SENTIMENT_SCORE'] = drill_totals['SCORE_SUM'] / drill_totals['REVIEW_COUNT']
+                st.metric(label="Reviews", value=f"{int(drill_totals['REVIEW_COUNT'].sum()):,}")
+                st.dataframe(drill_totals[['PRODUCT', 'REVIEW_COUNT', 'SENTIMENT_SCORE']], hide_index=True)
+
+                x_encoding, tooltip_encoding = period_encodings(drill_period)
+                with span("chart.build", chart="drilldown", time_period=drill_period):
+                    drill_chart = product_trend_chart(drill_data, x_encoding, tooltip_encoding)
+                st.altair_chart(drill_chart, use_container_width=True)
 
 with tab[2]:
     st.subheader('Prepared Data set')
-    st.dataframe(df)
+
+    # Filter, sort and page the cached Arrow table; only the visible page is sent to the browser
+    if st.toggle("Show review text", value=False):
+        text_snapshot = get_review_snapshot(include_text=True)
+        if refresh_requested or text_snapshot.is_stale(SNAPSHOT_REFRESH_INTERVAL):
+            try:
+                with session_pool.lease() as lease, span("data.refresh", text=True):
+                    text_snapshot.refresh(lease.session, query_cache)
+            except LeaseTimeout:
+                st.error("All Snowflake sessions are busy, so the review text could not be refreshed.")
+                if text_snapshot.data is None:
+                    st.stop()
+        review_table = text_snapshot.arrow()
+    else:
+        review_table = review_snapshot.arrow()
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        selected_products = st.multiselect("Product", options=product_data['PRODUCT'].tolist())
+    with col2:
+        date_range = st.date_input(
+            "Date range",
+            value=(df['DATE'].min().date(), df['DATE'].max().date()),
+        )
+    with col3:
+        score_range = st.slider("Sentiment score", min_value=-1.0, max_value=1.0, value=(-1.0, 1.0))
+
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        sort_by = st.selectbox("Sort by", options=SORTABLE_COLUMNS)
+    with col2:
+        descending = st.toggle("Descending", value=True)
+    with col3:
+        page_size = st.selectbox("Rows per page", options=PAGE_SIZES, index=1)
+
+    filtered_reviews = filter_reviews(
+        review_table,
+        products=selected_products,
+        # The date input returns a single date while the range is being picked
+        date_range=date_range if len(date_range) == 2 else None,
+        score_range=score_range,
+    )
+    total_rows = filtered_reviews.num_rows
+    page = st.number_input("Page", min_value=1, max_value=page_count(total_rows, page_size), value=1)
+
+    page_data = review_page(filtered_reviews, page, page_size, sort_by=sort_by, descending=descending)
+    st.dataframe(page_data, use_container_width=True)
+    st.caption(f"Showing rows {(page - 1) * page_size + min(1, len(page_data))}-"
+               f"{(page - 1) * page_size + len(page_data)} of {total_rows}")
 
 ##################################################################
 
 # M3 Lab3
 MODELS = ["mistral-large", "claude-3-5-sonnet", "llama3-8b"]
 
-def init_chatbot():
-    if "service_metadata" not in st.session_state:
-        services = session.sql("SHOW CORTEX SEARCH SERVICES;").collect()
-        service_metadata = []
-        if services:
-            for s in services:
-                svc_name = s["name"]
-                svc_search_col = session.sql(
-                    f"DESC CORTEX SEARCH SERVICE {svc_name};"
-                ).collect()[0]["search_column"]
-                service_metadata.append(
-                    {"name": svc_name, "search_column": svc_search_col}
-                )
+# Seconds the Cortex Search service metadata is shared across sessions before it is re-read
+SERVICE_METADATA_TTL = 600
 
-        st.session_state.service_metadata = service_metadata
-    
+@st.cache_data(ttl=SERVICE_METADATA_TTL, show_spinner=False)
+def load_service_metadata():
+    """Process-wide Cortex Search service metadata, shared by every browser session."""
+    with session_pool.lease() as lease:
+        return describe_search_services(lease.session)
+
+def init_chatbot():
     # Sidebar
     st.sidebar.title("⚙️ Chat settings")
+
+    if st.sidebar.button("Refresh search services"):
+        load_service_metadata.clear()
+    try:
+        st.session_state.service_metadata = load_service_metadata()
+    except LeaseTimeout:
+        st.sidebar.error("All Snowflake sessions are busy, so the search services could not be listed.")
+        st.session_state.setdefault("service_metadata", [])
     
     st.sidebar.selectbox(
         "Select cortex search service:",
@@ -201,37 +357,61 @@ def init_chatbot():
             min_value=1,
             max_value=20,
         )
+        st.toggle("Match paraphrased questions in the cache", key="semantic_cache", value=False)
+        st.number_input(
+            "Answer latency budget (seconds to first token)",
+            value=ANSWER_LATENCY_BUDGET,
+            key="latency_budget",
+            min_value=0.5,
+            max_value=30.0,
+        )
+        st.toggle("Fall back and hedge to faster models", key="hedge_models", value=True)
+
+    if st.sidebar.button("Clear response cache"):
+        for cache in get_response_caches().values():
+            cache.clear()
 
     st.sidebar.expander("Session State").write(st.session_state)
     if st.session_state.clear_conversation or "messages" not in st.session_state:
         st.session_state.messages = []
 
-def query_cortex_search_service(query):
-    db, schema = session.get_current_database(), session.get_current_schema()
-
+@st.cache_resource
+def get_response_caches():
+    """Process-wide caches for search results, completions and streamed answers."""
+    return {
+        "search": ResponseCache(),
+        # Prompts differ in context and history, so completions are only reused for the exact prompt
+        "completion": ResponseCache(normalize=None),
+        "answer": ResponseCache(),
+    }
+
+def cache_embedder(lease):
+    """Embedding function for paraphrase lookups, when enabled in the sidebar."""
+    return lease.state["embed"] if st.session_state.semantic_cache else None
+
+def search_callable(lease, service_name, limit):
+    """Build a thread-safe, cached search(query) function for one Cortex Search service."""
+    db, schema = lease.session.get_current_database(), lease.session.get_current_schema()
     cortex_search_service = (
-        root.databases[db]
+        lease.state["root"].databases[db]
         .schemas[schema]
-        .cortex_search_services[st.session_state.selected_cortex_search_service]
+        .cortex_search_services[service_name]
     )
+    search_col = [s["search_column"] for s in st.session_state.service_metadata
+                    if s["name"] == service_name][0]
 
-    context_documents = cortex_search_service.search(
-        query, columns=[], limit=st.session_state.num_retrieved_chunks
-    )
-    results = context_documents.results
-
-    service_metadata = st.session_state.service_metadata
-    search_col = [s["search_column"] for s in service_metadata
-                    if s["name"] == st.session_state.selected_cortex_search_service][0]
+    cache, embed = get_response_caches()["search"], cache_embedder(lease)
+    scope = (service_name, limit)
 
-    context_str = ""
-    for i, r in enumerate(results):
-        context_str += f"Context document {i+1}: {r[search_col]} \n" + "\n"
+    def search(query):
+        documents = cache.get(scope, query, embed)
+        if documents is None:
+            with span("cortex.search", service=service_name):
+                results = cortex_search_service.search(query, columns=[], limit=limit).results
+            documents = cache.put(scope, query, [r[search_col] for r in results], embed)
+        return documents
 
-    if st.session_state.debug:
-        st.sidebar.text_area("Context documents", context_str, height=500)
-
-    return context_str
+    return search
 
 def get_chat_history():
     start_index = max(
@@ -239,87 +419,99 @@ def get_chat_history():
     )
     return st.session_state.messages[start_index : len(st.session_state.messages) - 1]
 
-def complete(model, prompt):
-    return session.sql("SELECT snowflake.cortex.complete(?,?)", (model, prompt)).collect()[0][0]
-
-def make_chat_history_summary(chat_history, question):
-    prompt = f"""
-        [INST]
-        Based on the chat history below and the question, generate a query that extend the question
-        with the chat history provided. The query should be in natural language.
-        Answer with only the query. Do not add any explanation.
-
-        <chat_history>
-        {chat_history}
-        </chat_history>
-        
-        <question>
-        {question}
-        </question>
-        [/INST]
+@st.cache_resource
+def get_model_router():
+    """Process-wide model router, so latency statistics are shared by every session."""
+    return ModelRouter(MODELS)
+
+def completion_callables(lease):
     """
+    Build thread-safe complete(model, prompt) and cached(model, prompt) functions.
 
-    summary = complete(st.session_state.model_name, prompt)
+    complete calls the model and caches its answer; cached only looks the answer up, so
+    the router can skip the model call, and its latency statistics, on a hit.
+    """
+    backend, cache = lease.state["backend"], get_response_caches()["completion"]
 
-    if st.session_state.debug:
-        st.sidebar.text_area(
-            "Chat history summary", summary.replace("$", "\$"), height=150
-        )
+    def cached(model, prompt):
+        return cache.get(model, fingerprint(model, prompt))
+
+    def complete(model, prompt):
+        with span("cortex.complete", session=lease.session, model=model):
+            return cache.put(model, fingerprint(model, prompt), backend.complete(model, prompt))
+
+    return complete, cached
 
-    return summary
+def summarize_callable(lease):
+    """Build a thread-safe summarize(chat_history, question) function on the rewrite model."""
+    router, (complete, cached) = get_model_router(), completion_callables(lease)
+    hedge = st.session_state.hedge_models
 
-def create_prompt(user_question):
+    def summarize(chat_history, question):
+        summary, _ = router.complete(complete, summary_prompt(chat_history, question), hedge=hedge,
+                                     cached=cached)
+        return summary
+
+    return summarize
+
+def create_prompt(lease, user_question):
     """
     Create a prompt for the language model by combining the user question with context retrieved
     from the cortex search service and chat history (if enabled). Format the prompt according to
     the expected input format of the model.
 
+    The chat history summary and the searches run concurrently in `rag_pipeline.retrieve`;
+    everything that reads `st.session_state` happens here, on the script thread.
+
     Args:
+        lease (PooledSession): Snowpark session borrowed from the pool for this question.
         user_question (str): The user's question to generate a prompt for.
 
     Returns:
-        str: The generated prompt for the language model.
+        tuple: A prompt(model) function packing the retrieved context into that model's
+            token budget, so fallback models get a prompt that fits them, and a fingerprint
+            of the context and chat history of the selected model's prompt.
     """
-    if st.session_state.use_chat_history:
-        chat_history = get_chat_history()
-        if chat_history != []:
-            question_summary = make_chat_history_summary(chat_history, user_question)
-            prompt_context = query_cortex_search_service(question_summary)
-        else:
-            prompt_context = query_cortex_search_service(user_question)
-    else:
-        prompt_context = query_cortex_search_service(user_question)
-        chat_history = ""
-
-    prompt = f"""
-            [INST]
-            You are a helpful AI chat assistant with RAG capabilities. When a user asks you a question,
-            you will also be given context provided between <context> and </context> tags. Use that context
-            with the user's chat history provided in the between <chat_history> and </chat_history> tags
-            to provide a summary that addresses the user's question. Ensure the answer is coherent, concise,
-            and directly relevant to the user's question.
-
-            If the user asks a generic question which cannot be answered with the given context or chat_history,
-            just say "I don't know the answer to that question.
-
-            Don't say things like "according to the provided context".
-
-            <chat_history>
-            {chat_history}
-            </chat_history>
-            
-            <context>
-            {prompt_context}
-            </context>
-            
-            <question>
-            {user_question}
-            </question>
-            [/INST]
-            
-            Answer:
-        """
-    return prompt
+    chat_history = get_chat_history() if st.session_state.use_chat_history else []
+
+    with span("rag.retrieve"):
+        retrieval = retrieve(
+            user_question,
+            chat_history,
+            summarize=summarize_callable(lease),
+            search=search_callable(
+                lease,
+                st.session_state.selected_cortex_search_service,
+                st.session_state.num_retrieved_chunks,
+            ),
+            limit=st.session_state.num_retrieved_chunks,
+        )
+    assembly = assemble_context(retrieval.documents, st.session_state.model_name)
+
+    if st.session_state.debug:
+        if retrieval.question_summary is not None:
+            st.sidebar.text_area(
+                "Chat history summary", retrieval.question_summary.replace("$", "\$"), height=150
+            )
+        st.sidebar.text_area("Context documents", assembly.context, height=500)
+        st.sidebar.caption(
+            f"Context tokens: {assembly.tokens_used} of {assembly.budget} · "
+            f"{len(assembly.documents)} chunks used, {assembly.duplicates} duplicates "
+            f"and {assembly.over_budget} over budget dropped"
+        )
+        st.sidebar.caption(
+            f"Retrieval ({retrieval.path}): "
+            + " · ".join(f"{stage} {seconds:.2f}s" for stage, seconds in retrieval.timings.items())
+        )
+
+    prompt_history = chat_history if st.session_state.use_chat_history else ""
+    selected_model = st.session_state.model_name
+
+    def build_prompt(model):
+        model_assembly = assembly if model == selected_model else assemble_context(retrieval.documents, model)
+        return answer_prompt(prompt_history, model_assembly.context, user_question)
+
+    return build_prompt, fingerprint(assembly.context, prompt_history)
 
 def main():
     # st.title(f":speech_balloon: Chatbot with Cortex Search and Unstructured Data")
@@ -344,15 +536,74 @@ def main():
         with st.chat_message("user", avatar=icons["user"]):
             st.markdown(question.replace("$", "\$"))
 
-        # Display assistant response in chat message container
-        with st.chat_message("assistant", avatar=icons["assistant"]):
-            message_placeholder = st.empty()
-            question = question.replace("'", "")
-            with st.spinner("Thinking..."):
-                generated_response = complete(
-                    st.session_state.model_name, create_prompt(question)
+        # Display assistant response in chat message container, on a pooled Snowpark session
+        try:
+            with st.chat_message("assistant", avatar=icons["assistant"]), session_pool.lease() as lease:
+                message_placeholder = st.empty()
+                question = question.replace("'", "")
+                started = time.perf_counter()
+                with st.spinner("Thinking..."):
+                    build_prompt, context_fingerprint = create_prompt(lease, question)
+
+                # Answers are cached per service, model and retrieved context
+                answer_cache, embed = get_response_caches()["answer"], cache_embedder(lease)
+                answer_scope = (
+                    st.session_state.selected_cortex_search_service,
+                    st.session_state.model_name,
+                    context_fingerprint,
                 )
+                # Cached answers keep the model that generated them, which may be a fallback model
+                cached_response = answer_cache.get(answer_scope, question, embed)
+                if cached_response is not None:
+                    cached_text, answer_model = cached_response
+                    chunks = [cached_text]
+                else:
+                    # Falls back or hedges to another model when the selected one is too slow
+                    with st.spinner("Thinking..."):
+                        chunks, answer_model = get_model_router().stream(
+                            lease.state["backend"].stream,
+                            build_prompt,
+                            st.session_state.model_name,
+                            budget=st.session_state.latency_budget,
+                            hedge=st.session_state.hedge_models,
+                        )
+
+                # Render tokens as they arrive; timings are measured from when the question was asked
+                stream = TimedStream(chunks, started=started)
+                generated_response = ""
+                for chunk in stream:
+                    generated_response += chunk
+                    message_placeholder.markdown(generated_response + "▌")
                 message_placeholder.markdown(generated_response)
+                TRACER.record("cortex.answer.first_token", stream.time_to_first_token or 0, model=answer_model)
+                TRACER.record("cortex.answer.total", stream.total_time, model=answer_model,
+                              cached=cached_response is not None)
+                if cached_response is None:
+                    answer_cache.put(answer_scope, question, (generated_response, answer_model), embed)
+        except LeaseTimeout:
+            # Drop the unanswered question, so asking it again does not repeat it in the history
+            st.session_state.messages.pop()
+            st.error("All Snowflake sessions are busy. Please ask again shortly.")
+            return
+
+        if st.session_state.debug:
+            st.sidebar.caption(
+                f"Time to first token: {stream.time_to_first_token or 0:.2f}s · "
+                f"Total latency: {stream.total_time:.2f}s · Answered by {answer_model}"
+            )
+            router = get_model_router()
+            st.sidebar.dataframe(pd.DataFrame(
+                [
+                    (model, kind, samples, p50, p95)
+                    for kind, stats in [("rewrite", router.completion_stats), ("first token", router.first_token_stats)]
+                    for model, (samples, p50, p95) in stats.summary().items()
+                ],
+                columns=["MODEL", "CALL", "SAMPLES", "P50_S", "P95_S"],
+            ), hide_index=True)
+            st.sidebar.caption("Response cache: " + " · ".join(
+                f"{name} {cache.hits} hits ({cache.semantic_hits} paraphrased) / {cache.misses} misses"
+                for name, cache in get_response_caches().items()
+            ))
 
         st.session_state.messages.append(
             {"role": "assistant", "content": generated_response}
@@ -364,5 +615,29 @@ def main():
 #     main()
 
 with tab[3]:
-    root = Root(session)
     main()
+
+# Rendered last, so the spans of this run are included
+with tab[4]:
+    st.subheader("Performance")
+    stage_stats = TRACER.percentiles()
+    if stage_stats:
+        st.dataframe(
+            pd.DataFrame(stage_stats, columns=["STAGE", "COUNT", "P50_S", "P95_S", "P99_S", "MAX_S"]),
+            hide_index=True,
+        )
+        st.caption("Recent spans")
+        st.dataframe(
+            pd.DataFrame(list(TRACER.spans)[-50:][::-1])[["name", "duration", "query_ids", "error", "thread"]],
+            hide_index=True,
+        )
+    else:
+        st.caption("No spans recorded yet.")
+    st.caption("Query cache")
+    st.dataframe(pd.DataFrame([query_cache.stats]), hide_index=True)
+    st.download_button(
+        "Export spans (JSON lines)",
+        TRACER.to_jsonl(),
+        file_name="avalanche-spans.jsonl",
+        mime="application/jsonl",
+    )
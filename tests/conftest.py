@@ -0,0 +1,11 @@
+"""
+Offline tests for the fakes that stand in for Snowflake.
+Run from the repository root: python -m pytest tests
+"""
+
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "assets"))
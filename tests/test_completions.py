@@ -0,0 +1,22 @@
+from completions import FakeBackend, TimedStream, get_backend
+
+
+def test_fake_backend_streams_the_response_in_chunks():
+    backend = FakeBackend(response="abcdefghij", chunk_size=4, first_token_delay=0, chunk_delay=0)
+    assert list(backend.stream("mistral-large", "prompt")) == ["abcd", "efgh", "ij"]
+    assert backend.complete("mistral-large", "prompt") == "abcdefghij"
+
+
+def test_get_backend_selects_the_fake_by_name():
+    assert isinstance(get_backend(None, "fake"), FakeBackend)
+
+
+def test_timed_stream_measures_first_token_and_total_time():
+    backend = FakeBackend(response="abcdefgh", chunk_size=4, first_token_delay=0.05, chunk_delay=0.02)
+    stream = TimedStream(backend.stream("mistral-large", "prompt"))
+    assert stream.time_to_first_token is None
+
+    assert "".join(stream) == "abcdefgh"
+    assert stream.text == "abcdefgh"
+    assert 0.05 <= stream.time_to_first_token < stream.total_time
+    assert stream.total_time >= 0.07
@@ -0,0 +1,39 @@
+import time
+
+from rag_pipeline import retrieve
+
+HISTORY = [{"role": "user", "content": "goggles"}, {"role": "assistant", "content": "Yes."}]
+
+
+def search(query):
+    return [f"{query} result {i}" for i in range(3)]
+
+
+def test_rewrite_and_its_search_are_merged_within_the_budget():
+    retrieval = retrieve("do they fog", HISTORY, lambda history, question: "goggle fogging", search, 10)
+    assert retrieval.path == "summary_merged"
+    assert retrieval.documents[0] == "goggle fogging result 0"
+    assert "goggles do they fog result 0" in retrieval.documents
+
+
+def test_budget_covers_the_rewrite_and_its_search():
+    def slow_search(query):
+        if query == "goggle fogging":
+            time.sleep(0.3)
+        return search(query)
+
+    started = time.perf_counter()
+    retrieval = retrieve("do they fog", HISTORY, lambda history, question: "goggle fogging", slow_search, 10,
+                         summary_budget=0.1)
+    assert time.perf_counter() - started < 0.25
+    assert retrieval.path == "speculative"
+    assert retrieval.documents == search("goggles do they fog")
+
+
+def test_failed_rewrite_falls_back_to_the_speculative_search():
+    def summarize(history, question):
+        raise RuntimeError("every model failed")
+
+    retrieval = retrieve("do they fog", HISTORY, summarize, search, 10)
+    assert retrieval.path == "summary_failed"
+    assert retrieval.documents == search("goggles do they fog")
@@ -0,0 +1,51 @@
+import datetime
+
+from score_sentiment import score_reviews
+
+PATHS = ["review-01.docx", "review-02.docx", "review-03.docx"]
+
+
+class FakeResult:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def collect(self):
+        return self.rows
+
+
+class FakeSession:
+    """Answers the statements score_reviews issues for a few parsed reviews."""
+
+    def __init__(self, paths):
+        self.paths = paths
+        self.merged = []
+
+    def sql(self, query, params=None):
+        if "LEFT JOIN" in query:
+            return FakeResult([{"RELATIVE_PATH": path} for path in self.paths])
+        if query.lstrip().startswith("SELECT"):
+            return FakeResult([
+                {"RELATIVE_PATH": path, "PRODUCT": "Goggles", "DATE": datetime.date(2024, 1, 2),
+                 "REVIEW": f"text of {path}", "REVIEW_HASH": "hash"}
+                for path in params
+            ])
+        if query.lstrip().startswith("MERGE"):
+            self.merged.append(params[0::6])
+        if query.lstrip().startswith("DELETE"):
+            return FakeResult([[0]])
+        return FakeResult([])
+
+
+def test_failed_batch_is_recorded_and_the_others_still_merge():
+    def scorer(texts):
+        if "text of review-02.docx" in texts:
+            raise RuntimeError("scorer unavailable")
+        return [0.5 for _ in texts]
+
+    session = FakeSession(PATHS)
+    result = score_reviews(session, batch_size=1, max_workers=2, scorer=scorer)
+
+    assert result["scored"] == ["review-01.docx", "review-03.docx"]
+    assert result["failed"] == [(["review-02.docx"], "scorer unavailable")]
+    assert result["removed"] == 0
+    assert sorted(session.merged) == [["review-01.docx"], ["review-03.docx"]]
@@ -0,0 +1,68 @@
+import pytest
+
+from session_pool import LeaseTimeout, SessionPool
+
+
+class FakeSession:
+    def __init__(self):
+        self.query_tag = None
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+def no_check(session):
+    pass
+
+
+def test_lease_reuses_a_released_session():
+    pool = SessionPool(FakeSession, size=2, health_check=no_check)
+    with pool.lease() as first:
+        assert first.session.query_tag == "avalanche:1"
+    with pool.lease() as second:
+        assert second is first
+    assert pool.created == 1 and pool.idle == 1
+
+
+def test_lease_times_out_when_every_session_is_leased():
+    pool = SessionPool(FakeSession, size=1, health_check=no_check)
+    with pool.lease():
+        with pytest.raises(LeaseTimeout):
+            pool.acquire(timeout=0.01)
+
+
+def test_failed_create_gives_the_slot_back():
+    sessions = []
+
+    def factory():
+        sessions.append(FakeSession())
+        return sessions[-1]
+
+    def check(session):
+        if len(sessions) == 1:
+            raise RuntimeError("warehouse suspended")
+
+    pool = SessionPool(factory, size=1, health_check=check)
+    with pytest.raises(RuntimeError):
+        pool.acquire()
+    assert sessions[0].closed and pool.created == 0
+
+    # The retry gets a new slot number, so query tags never repeat
+    with pool.lease() as pooled:
+        assert pooled.session is sessions[1]
+        assert pooled.slot == 2
+
+
+def test_warm_pools_the_sessions_that_could_be_created():
+    attempts = []
+
+    def factory():
+        attempts.append(None)
+        if len(attempts) == 2:
+            raise RuntimeError("authentication failed")
+        return FakeSession()
+
+    pool = SessionPool(factory, size=3, health_check=no_check)
+    assert pool.warm() == 2
+    assert pool.created == 2 and pool.idle == 2
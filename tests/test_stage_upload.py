@@ -0,0 +1,34 @@
+from stage_upload import LocalStage, remove_files, upload_files
+
+
+def write(path, text):
+    with open(path, "w") as f:
+        f.write(text)
+    return str(path)
+
+
+def test_upload_skips_files_unchanged_on_the_stage(tmp_path):
+    stage = LocalStage(str(tmp_path / "stage"))
+    first = write(tmp_path / "review-01.docx", "first")
+    second = write(tmp_path / "review-02.docx", "second")
+    assert upload_files(stage, [first, second]) == ([first, second], [], [])
+
+    write(tmp_path / "review-02.docx", "changed")
+    assert upload_files(stage, [first, second]) == ([second], [first], [])
+    assert stage.list()["review-02.docx"]["size"] == len("changed")
+
+
+def test_upload_reports_failed_puts(tmp_path):
+    stage = LocalStage(str(tmp_path / "stage"))
+    missing = str(tmp_path / "missing.docx")
+    uploaded, skipped, failed = upload_files(stage, [missing])
+    assert (uploaded, skipped) == ([], [])
+    assert [path for path, _ in failed] == [missing]
+
+
+def test_remove_files_only_removes_staged_files(tmp_path):
+    stage = LocalStage(str(tmp_path / "stage"))
+    staged = write(tmp_path / "review-01.docx", "first")
+    upload_files(stage, [staged])
+    assert remove_files(stage, [staged, str(tmp_path / "review-09.docx")]) == ["review-01.docx"]
+    assert stage.list() == {}
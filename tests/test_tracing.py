@@ -0,0 +1,52 @@
+import threading
+
+from snowflake.snowpark.query_history import QueryRecord
+
+from tracing import Tracer
+
+
+class FakeHistory:
+    def __init__(self):
+        self.queries = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+class FakeSession:
+    """Session shared by two threads; every query is recorded with the issuing thread."""
+
+    def __init__(self):
+        self.history = FakeHistory()
+
+    def query_history(self, include_thread_id=False):
+        return self.history
+
+    def run(self, query_id):
+        self.history.queries.append(QueryRecord(query_id, "SELECT 1", thread_id=threading.get_ident()))
+
+
+def test_span_records_only_queries_issued_on_its_thread():
+    tracer = Tracer(trace_file=None)
+    session = FakeSession()
+    with tracer.span("data.refresh", session=session):
+        session.run("own")
+        other = threading.Thread(target=session.run, args=("other",))
+        other.start()
+        other.join()
+    assert tracer.spans[-1]["query_ids"] == ["own"]
+
+
+def test_span_records_errors_and_durations():
+    tracer = Tracer(trace_file=None)
+    try:
+        with tracer.span("cortex.complete", model="mistral-large"):
+            raise ValueError("boom")
+    except ValueError:
+        pass
+    span = tracer.spans[-1]
+    assert span["error"] == "ValueError: boom" and span["model"] == "mistral-large"
+    assert tracer.percentiles()[0][:2] == ("cortex.complete", 1)
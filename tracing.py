@@ -0,0 +1,132 @@
+"""
+Lightweight latency tracing for the Avalanche app.
+Stages are wrapped in `span` context managers or `traced` decorators; each finished span
+keeps its duration, attributes and, when a Snowpark session is passed, the IDs of the
+queries it ran, so slow spans can be looked up in QUERY_HISTORY. Durations feed rolling
+per-stage percentiles for the Performance tab, and spans are exported as JSON lines
+(AVALANCHE_TRACE_FILE or the Performance tab download) to compare deployments.
+"""
+
+import functools
+import json
+import os
+import socket
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import numpy as np
+
+# Durations kept per stage for the percentiles, and finished spans kept for export
+STAGE_WINDOW = 500
+SPAN_HISTORY = 2000
+
+# When set, every finished span is also appended to this JSON lines file
+TRACE_FILE = os.environ.get("AVALANCHE_TRACE_FILE")
+
+# Identifies the deployment in exported spans, e.g. a release tag or commit
+DEPLOYMENT = os.environ.get("AVALANCHE_DEPLOYMENT", socket.gethostname())
+
+
+class Tracer:
+    def __init__(self, stage_window=STAGE_WINDOW, span_history=SPAN_HISTORY, trace_file=TRACE_FILE,
+                 deployment=DEPLOYMENT):
+        self.stage_window = stage_window
+        self.trace_file = trace_file
+        self.deployment = deployment
+        self.spans = deque(maxlen=span_history)
+        self._durations = {}
+        self._lock = threading.Lock()
+
+    def record(self, name, duration, query_ids=None, error=None, **attributes):
+        """Store a finished span."""
+        span = {
+            "name": name,
+            "start": time.time() - duration,
+            "duration": duration,
+            "query_ids": query_ids or [],
+            "error": error,
+            "deployment": self.deployment,
+            "thread": threading.current_thread().name,
+            **attributes,
+        }
+        with self._lock:
+            self._durations.setdefault(name, deque(maxlen=self.stage_window)).append(duration)
+            self.spans.append(span)
+            if self.trace_file:
+                with open(self.trace_file, 'a') as f:
+                    f.write(json.dumps(span, default=str) + "\n")
+        return span
+
+    @contextmanager
+    def span(self, name, session=None, **attributes):
+        """
+        Time the body of a `with` block as the span `name`.
+
+        Args:
+            name (str): Stage name; spans with the same name share percentiles.
+            session: Snowpark session whose queries issued in the block are attached by ID.
+                Only queries issued on this thread are attached: a pooled session may run
+                other threads' queries meanwhile, and those are not this span's. Queries
+                the block hands off to worker threads are therefore not attached either.
+            **attributes: Extra JSON-serializable values stored with the span.
+        """
+        history = session.query_history(include_thread_id=True) if session is not None else None
+        thread_id = threading.get_ident()
+        start = time.perf_counter()
+        error = None
+        try:
+            if history is not None:
+                with history:
+                    yield attributes
+            else:
+                yield attributes
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            query_ids = [
+                q.query_id for q in history.queries if q.thread_id == thread_id
+            ] if history is not None else []
+            self.record(name, time.perf_counter() - start, query_ids, error, **attributes)
+
+    def traced(self, name=None):
+        """Decorator tracing every call of a function as the span `name` (default: its name)."""
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.span(name or func.__qualname__):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def percentiles(self):
+        """
+        Rolling latency percentiles per stage.
+
+        Returns:
+            list: (stage, count, p50, p95, p99, max) tuples in seconds, sorted by stage.
+        """
+        with self._lock:
+            durations = {name: list(values) for name, values in self._durations.items()}
+        return [
+            (name, len(values), *np.percentile(values, [50, 95, 99]).tolist(), max(values))
+            for name, values in sorted(durations.items())
+        ]
+
+    def to_jsonl(self):
+        with self._lock:
+            spans = list(self.spans)
+        return "".join(json.dumps(span, default=str) + "\n" for span in spans)
+
+    def clear(self):
+        with self._lock:
+            self._durations.clear()
+            self.spans.clear()
+
+
+# Process-wide tracer shared by the app's modules
+TRACER = Tracer()
+span = TRACER.span
+traced = TRACER.traced